@@ -7,12 +7,14 @@ from raha.load_dataset import Dataset
 
 RAHA_RESULTS_PATH = "results/raha-detection-results/"
 BARAN_RESULTS_PATH = "results/baran-correction-results/"
+RAHA_STRATEGY_CACHE_PATH = os.getenv("RAHA_STRATEGY_CACHE_PATH", "results/raha-strategy-cache/")
 
 def run_raha(dataset_name: str, scenario: str, version: str):
     raha_dataset = Dataset(dataset_name, scenario, version, RAHA_RESULTS_PATH)
     app = Detection()
     app.VERBOSE = False
     app.SAVE_RESULTS = False
+    app.STRATEGY_CACHE_PATH = RAHA_STRATEGY_CACHE_PATH
     detected_cells = app.run(raha_dataset)
 
     p, r, f1 = raha_dataset.get_data_cleaning_evaluation(detected_cells)[:3]
@@ -1,5 +1,6 @@
 from .dataset import *
 from .load_dataset import *
+from .strategy_profiles import *
 from .detection import *
 from .correction import *
 from .baselines import *
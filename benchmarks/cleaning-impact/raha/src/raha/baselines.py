@@ -14,7 +14,6 @@ import os
 import re
 import json
 import random
-import pickle
 import operator
 import itertools
 
@@ -109,8 +108,7 @@ class Baselines:
                   "------------------------------------------------------------------------")
         d = raha.dataset.Dataset(dd)
         sp_folder_path = os.path.join(os.path.dirname(dd["path"]), "raha-baran-results-" + d.name, "strategy-profiling")
-        strategy_profiles_list = [pickle.load(open(os.path.join(sp_folder_path, strategy_file), "rb"))
-                                  for strategy_file in os.listdir(sp_folder_path)]
+        strategy_profiles_list = raha.StrategyProfileStore(sp_folder_path).load()
         random_tuples_list = [i for i in random.sample(range(d.dataframe.shape[0]), d.dataframe.shape[0])]
         labeled_tuples = {i: 1 for i in random_tuples_list[:int(d.dataframe.shape[0] / 100.0)]}
         best_f1 = -1.0
@@ -173,8 +171,7 @@ class Baselines:
                   "------------------------------------------------------------------------")
         d = raha.dataset.Dataset(dd)
         sp_folder_path = os.path.join(os.path.dirname(dd["path"]), "raha-baran-results-" + d.name, "strategy-profiling")
-        strategy_profiles_list = [pickle.load(open(os.path.join(sp_folder_path, strategy_file), "rb"))
-                                  for strategy_file in os.listdir(sp_folder_path)]
+        strategy_profiles_list = raha.StrategyProfileStore(sp_folder_path).load()
         detection_dictionary = {}
         for strategy_profile in strategy_profiles_list:
             algorithm = json.loads(strategy_profile["name"])[0]
@@ -240,8 +237,7 @@ class Baselines:
                   "------------------------------------------------------------------------")
         d = raha.dataset.Dataset(dd)
         sp_folder_path = os.path.join(os.path.dirname(dd["path"]), "raha-baran-results-" + d.name, "strategy-profiling")
-        strategy_profiles_list = [pickle.load(open(os.path.join(sp_folder_path, strategy_file), "rb"))
-                                  for strategy_file in os.listdir(sp_folder_path)]
+        strategy_profiles_list = raha.StrategyProfileStore(sp_folder_path).load()
         cells_counter = {}
         for strategy_profile in strategy_profiles_list:
             for cell in strategy_profile["output"]:
@@ -275,8 +271,7 @@ class Baselines:
         d = raha.dataset.Dataset(dd)
         actual_errors_dictionary = d.get_actual_errors_dictionary()
         sp_folder_path = os.path.join(os.path.dirname(dd["path"]), "raha-baran-results-" + d.name, "strategy-profiling")
-        strategy_profiles_list = [pickle.load(open(os.path.join(sp_folder_path, strategy_file), "rb"))
-                                  for strategy_file in os.listdir(sp_folder_path)]
+        strategy_profiles_list = raha.StrategyProfileStore(sp_folder_path).load()
         random_tuples_list = [i for i in random.sample(range(d.dataframe.shape[0]), d.dataframe.shape[0])]
         labeled_tuples = {i: 1 for i in random_tuples_list[:10]}
         detection_dictionary = {}
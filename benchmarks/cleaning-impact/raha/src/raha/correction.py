@@ -20,6 +20,7 @@ import random
 import difflib
 import unicodedata
 import itertools
+import tempfile
 import functools
 from multiprocessing import Pool
 
@@ -27,6 +28,7 @@ import bs4
 import bz2
 import numpy
 import py7zr
+import pandas
 import mwparserfromhell
 import sklearn.svm
 import sklearn.ensemble
@@ -37,15 +39,13 @@ import raha
 from raha.load_dataset import Dataset
 ########################################
 
-def worker_init_prediction(dataset, cls_model):
+def worker_init_correction(dataset, delta_log_path):
     global d
-    d = dataset 
-    global classification_model
-    classification_model = cls_model
-
-def worker_init_feat_generation(dataset):
-    global d
-    d = dataset 
+    d = dataset
+    global delta_log, delta_log_version, classifiers
+    delta_log = open(delta_log_path, "rb")
+    delta_log_version = 0
+    classifiers = {}
 
 ########################################
 class Correction:
@@ -74,6 +74,20 @@ class Correction:
 
         self.LABELING_ERROR_PCT = 0  # simulates pct with which user provides wrong labels
 
+        self._pool = None
+        self._delta_log = None
+        self._delta_log_path = None
+        self._delta_log_version = 0
+
+    def __getstate__(self):
+        """
+        The worker pool and its delta log stay in the main process.
+        """
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        state["_delta_log"] = None
+        return state
+
     @staticmethod
     def _wikitext_segmenter(wikitext):
         """
@@ -194,12 +208,34 @@ class Correction:
     @staticmethod
     def _value_encoder(value, encoding):
         """
-        This method represents a value with a specified value abstraction encoding method.
+        This method represents a value with a specified value abstraction encoding method, as a tuple of characters or
+        of their unicode categories.
         """
         if encoding == "identity":
-            return json.dumps(list(value))
+            return tuple(value)
         if encoding == "unicode":
-            return json.dumps([unicodedata.category(c) for c in value])
+            return tuple(unicodedata.category(c) for c in value)
+
+    @staticmethod
+    def _value_based_models_converter(models):
+        """
+        This method converts value-based models stored with JSON encodings and transformations, as pretrained by earlier
+        versions, to tuple encodings and (start, end, replacement) transformation tuples.
+        """
+        converted_models = []
+        for m, model in enumerate(models):
+            converted_model = {}
+            for encoded_value_string, corrections in model.items():
+                if isinstance(encoded_value_string, str):
+                    encoded_value_string = tuple(json.loads(encoded_value_string))
+                if m < 3:
+                    corrections = {tuple((*json.loads(change_range_string), replacement) for change_range_string,
+                                         replacement in json.loads(transformation).items())
+                                   if isinstance(transformation, str) else transformation: count
+                                   for transformation, count in corrections.items()}
+                converted_model[encoded_value_string] = corrections
+            converted_models.append(converted_model)
+        return converted_models
 
     @staticmethod
     def _to_model_adder(model, key, value):
@@ -221,26 +257,25 @@ class Correction:
                                  ud["old_value"] and len(ud["old_value"]) <= self.MAX_VALUE_LENGTH and
                                  ud["old_value"] != ud["new_value"] and ud["old_value"].lower() != "n/a" and
                                  not ud["old_value"][0].isdigit()):
-            remover_transformation = {}
-            adder_transformation = {}
-            replacer_transformation = {}
+            remover_transformation = []
+            adder_transformation = []
+            replacer_transformation = []
             s = difflib.SequenceMatcher(None, ud["old_value"], ud["new_value"])
             for tag, i1, i2, j1, j2 in s.get_opcodes():
-                index_range = json.dumps([i1, i2])
                 if tag == "delete":
-                    remover_transformation[index_range] = ""
+                    remover_transformation.append((i1, i2, ""))
                 if tag == "insert":
-                    adder_transformation[index_range] = ud["new_value"][j1:j2]
+                    adder_transformation.append((i1, i2, ud["new_value"][j1:j2]))
                 if tag == "replace":
-                    replacer_transformation[index_range] = ud["new_value"][j1:j2]
+                    replacer_transformation.append((i1, i2, ud["new_value"][j1:j2]))
             for encoding in self.VALUE_ENCODINGS:
                 encoded_old_value = self._value_encoder(ud["old_value"], encoding)
                 if remover_transformation:
-                    self._to_model_adder(models[0], encoded_old_value, json.dumps(remover_transformation))
+                    self._to_model_adder(models[0], encoded_old_value, tuple(remover_transformation))
                 if adder_transformation:
-                    self._to_model_adder(models[1], encoded_old_value, json.dumps(adder_transformation))
+                    self._to_model_adder(models[1], encoded_old_value, tuple(adder_transformation))
                 if replacer_transformation:
-                    self._to_model_adder(models[2], encoded_old_value, json.dumps(replacer_transformation))
+                    self._to_model_adder(models[2], encoded_old_value, tuple(replacer_transformation))
                 self._to_model_adder(models[3], encoded_old_value, ud["new_value"])
 
     def pretrain_value_based_models(self, revision_data_folder):
@@ -313,22 +348,20 @@ class Correction:
                 if encoded_value_string in model:
                     sum_scores = sum(model[encoded_value_string].values())
                     if model_name in ["remover", "adder", "replacer"]:
-                        for transformation_string in model[encoded_value_string]:
+                        for transformation in model[encoded_value_string]:
                             index_character_dictionary = {i: c for i, c in enumerate(ed["old_value"])}
-                            transformation = json.loads(transformation_string)
-                            for change_range_string in transformation:
-                                change_range = json.loads(change_range_string)
+                            for start, end, replacement in transformation:
                                 if model_name in ["remover", "replacer"]:
-                                    for i in range(change_range[0], change_range[1]):
+                                    for i in range(start, end):
                                         index_character_dictionary[i] = ""
                                 if model_name in ["adder", "replacer"]:
-                                    ov = "" if change_range[0] not in index_character_dictionary else \
-                                        index_character_dictionary[change_range[0]]
-                                    index_character_dictionary[change_range[0]] = transformation[change_range_string] + ov
+                                    ov = "" if start not in index_character_dictionary else \
+                                        index_character_dictionary[start]
+                                    index_character_dictionary[start] = replacement + ov
                             new_value = ""
                             for i in range(len(index_character_dictionary)):
                                 new_value += index_character_dictionary[i]
-                            pr = model[encoded_value_string][transformation_string] / sum_scores
+                            pr = model[encoded_value_string][transformation] / sum_scores
                             if pr >= self.MIN_CORRECTION_CANDIDATE_PROBABILITY:
                                 results_dictionary[new_value] = pr
                     if model_name == "swapper":
@@ -339,12 +372,16 @@ class Correction:
                 results_list.append(results_dictionary)
         return results_list
 
-    def _vicinity_based_corrector(self, models, ed):
+    def _vicinity_based_corrector(self, models, ed, memo=None):
         """
         This method takes the vicinity-based models and an error dictionary to generate potential vicinity-based corrections.
+        The corrections of every (context column, column, context value) are looked up in and added to the memo, if any.
         """
         results_list = []
         for j, cv in enumerate(ed["vicinity"]):
+            if memo is not None and (j, ed["column"], cv) in memo:
+                results_list.append(memo[(j, ed["column"], cv)])
+                continue
             results_dictionary = {}
             if j != ed["column"] and cv in models[j][ed["column"]]:
                 sum_scores = sum(models[j][ed["column"]][cv].values())
@@ -352,6 +389,8 @@ class Correction:
                     pr = models[j][ed["column"]][cv][new_value] / sum_scores
                     if pr >= self.MIN_CORRECTION_CANDIDATE_PROBABILITY:
                         results_dictionary[new_value] = pr
+                if memo is not None:
+                    memo[(j, ed["column"], cv)] = results_dictionary
             results_list.append(results_dictionary)
         return results_list
 
@@ -389,25 +428,55 @@ class Correction:
         """
         d.value_models = [{}, {}, {}, {}]
         if os.path.exists(self.PRETRAINED_VALUE_BASED_MODELS_PATH):
-            d.value_models = pickle.load(bz2.BZ2File(self.PRETRAINED_VALUE_BASED_MODELS_PATH, "rb"))
+            d.value_models = self._value_based_models_converter(
+                pickle.load(bz2.BZ2File(self.PRETRAINED_VALUE_BASED_MODELS_PATH, "rb")))
             if self.VERBOSE:
                 print("The pretrained value-based models are loaded.")
         d.vicinity_models = {j: {jj: {} for jj in range(d.dataframe.shape[1])} for j in range(d.dataframe.shape[1])}
         d.domain_models = {}
-        for row in d.dataframe.itertuples():
-            i, row = row[0], row[1:]
-            vicinity_list = [cv if (i, cj) not in d.detected_cells else self.IGNORE_SIGN for cj, cv in enumerate(row)]
-            for j, value in enumerate(row):
-                if (i, j) not in d.detected_cells:
-                    temp_vicinity_list = list(vicinity_list)
-                    temp_vicinity_list[j] = self.IGNORE_SIGN
-                    update_dictionary = {
-                        "column": j,
-                        "new_value": value,
-                        "vicinity": temp_vicinity_list
-                    }
-                    self._vicinity_based_models_updater(d.vicinity_models, update_dictionary)
-                    self._domain_based_model_updater(d.domain_models, update_dictionary)
+        d.value_corrections_memo = {}
+        d.vicinity_corrections_memo = {}
+        d.domain_corrections_memo = {}
+        values = d.dataframe.to_numpy()
+        clean_cells = numpy.ones(values.shape, dtype=bool)
+        if d.detected_cells:
+            detected_cells = numpy.array(list(d.detected_cells.keys()), dtype=int).reshape(-1, 2)
+            clean_cells[detected_cells[:, 0], detected_cells[:, 1]] = False
+        context_cells = clean_cells & (values != self.IGNORE_SIGN)
+        # The models are filled in order of first occurrence, as if the rows were added one by one, so that the order
+        # of the correction candidates does not change.
+        for j in sorted(numpy.flatnonzero(clean_cells.any(axis=0)).tolist(), key=lambda j: clean_cells[:, j].argmax()):
+            value_counts = pandas.Series(values[clean_cells[:, j], j]).value_counts(sort=False, dropna=False)
+            d.domain_models[j] = dict(zip(value_counts.index.tolist(), value_counts.astype(float).tolist()))
+            d.domain_corrections_memo[j] = self._domain_based_corrector(d.domain_models, {"column": j})
+        value_codes = numpy.zeros(values.shape, dtype=numpy.int64)
+        unique_values = []
+        for j in range(values.shape[1]):
+            value_codes[:, j], column_unique_values = pandas.factorize(values[:, j], use_na_sentinel=False)
+            unique_values.append(column_unique_values.tolist())
+        for jj in range(values.shape[1]):
+            for j in range(values.shape[1]):
+                rows = context_cells[:, jj] & clean_cells[:, j]
+                if jj == j or not rows.any():
+                    continue
+                # Every (context value, value) pair is counted once, in order of first occurrence.
+                pair_codes = value_codes[rows, jj] * len(unique_values[j]) + value_codes[rows, j]
+                pair_codes, first_rows, pair_counts = numpy.unique(pair_codes, return_index=True, return_counts=True)
+                pair_order = numpy.argsort(first_rows, kind="stable")
+                pair_codes, pair_counts = pair_codes[pair_order], pair_counts[pair_order]
+                context_codes, target_codes = numpy.divmod(pair_codes, len(unique_values[j]))
+                context_sums = numpy.bincount(context_codes, weights=pair_counts)
+                probabilities = (pair_counts / context_sums[context_codes]).tolist()
+                model = d.vicinity_models[jj][j]
+                for context_code, target_code, count, pr in zip(context_codes.tolist(), target_codes.tolist(),
+                                                                pair_counts.tolist(), probabilities):
+                    cv = unique_values[jj][context_code]
+                    if cv not in model:
+                        model[cv] = {}
+                        d.vicinity_corrections_memo[(jj, j, cv)] = {}
+                    model[cv][unique_values[j][target_code]] = float(count)
+                    if pr >= self.MIN_CORRECTION_CANDIDATE_PROBABILITY:
+                        d.vicinity_corrections_memo[(jj, j, cv)][unique_values[j][target_code]] = pr
         if self.VERBOSE:
             print("The error corrector models are initialized.")
 
@@ -464,6 +533,7 @@ class Correction:
         This method updates the error corrector models with a new labeled tuple.
         """
         cleaned_sampled_tuple = [d.labeled_cells[(d.sampled_tuple, j)][1] for j in range(d.dataframe.shape[1])]
+        model_updates = []
         for j in range(d.dataframe.shape[1]):
             cell = (d.sampled_tuple, j)
             update_dictionary = {
@@ -477,15 +547,119 @@ class Correction:
                     self._to_model_adder(d.column_errors, cell[1], cell)
                 self._value_based_models_updater(d.value_models, update_dictionary)
                 self._domain_based_model_updater(d.domain_models, update_dictionary)
+                model_updates.append(["value", dict(update_dictionary)])
+                model_updates.append(["domain", dict(update_dictionary)])
                 update_dictionary["vicinity"] = [cv if j != cj else self.IGNORE_SIGN
                                                  for cj, cv in enumerate(cleaned_sampled_tuple)]
             else:
                 update_dictionary["vicinity"] = [cv if j != cj and d.labeled_cells[(d.sampled_tuple, cj)][0] == 1
                                                  else self.IGNORE_SIGN for cj, cv in enumerate(cleaned_sampled_tuple)]
             self._vicinity_based_models_updater(d.vicinity_models, update_dictionary)
+            model_updates.append(["vicinity", update_dictionary])
+        self._invalidate_corrections_memos(d, model_updates)
+        if self._pool is not None:
+            self._broadcast(["models", model_updates])
         if self.VERBOSE:
             print("The error corrector models are updated with new labeled tuple {}.".format(d.sampled_tuple))
 
+    @staticmethod
+    def _invalidate_corrections_memos(d, model_updates):
+        """
+        This method drops the memoized corrections that depend on the models changed by the given model updates: all
+        value-based corrections if a value-based model changed, the domain-based corrections of updated columns, and
+        the vicinity-based corrections of updated context values.
+        """
+        for model_type, update_dictionary in model_updates:
+            if model_type == "value":
+                d.value_corrections_memo.clear()
+            elif model_type == "domain":
+                d.domain_corrections_memo.pop(update_dictionary["column"], None)
+            elif model_type == "vicinity":
+                for j, cv in enumerate(update_dictionary["vicinity"]):
+                    d.vicinity_corrections_memo.pop((j, update_dictionary["column"], cv), None)
+
+    def _worker_pool(self, d):
+        """
+        This method returns the worker pool of the run and starts it on first use. The workers receive the dataset with
+        its error corrector models once. Later model updates and trained classifiers are broadcast to them through an
+        append-only delta log file, so that only these deltas are transferred.
+        """
+        if self._pool is None:
+            delta_log_descriptor, self._delta_log_path = tempfile.mkstemp(prefix="baran-delta-log-")
+            self._delta_log = os.fdopen(delta_log_descriptor, "wb")
+            self._delta_log_version = 0
+            self._pool = Pool(self.NUM_WORKERS, initializer=worker_init_correction, initargs=(d, self._delta_log_path))
+        return self._pool
+
+    def close_worker_pool(self):
+        """
+        This method stops the worker pool and removes its delta log.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+            self._delta_log.close()
+            self._delta_log = None
+            os.remove(self._delta_log_path)
+            self._delta_log_path = None
+
+    def _broadcast(self, delta):
+        """
+        This method appends a delta to the delta log. Tasks carry the resulting log version, so that the workers apply
+        all deltas up to it before they run.
+        """
+        pickle.dump(delta, self._delta_log)
+        self._delta_log.flush()
+        self._delta_log_version += 1
+
+    def _apply_deltas(self, version):
+        """
+        This method applies the deltas of the delta log up to the given version in a worker.
+        """
+        global delta_log_version
+        while delta_log_version < version:
+            delta_type, delta = pickle.load(delta_log)
+            if delta_type == "models":
+                for model_type, update_dictionary in delta:
+                    if model_type == "value":
+                        self._value_based_models_updater(d.value_models, update_dictionary)
+                    elif model_type == "domain":
+                        self._domain_based_model_updater(d.domain_models, update_dictionary)
+                    elif model_type == "vicinity":
+                        self._vicinity_based_models_updater(d.vicinity_models, update_dictionary)
+                self._invalidate_corrections_memos(d, delta)
+            elif delta_type == "classifier":
+                # The columns are predicted one after another, so only the latest classifier is kept.
+                classifier_key, classifier_bytes = delta
+                classifiers.clear()
+                classifiers[classifier_key] = classifier_bytes
+            delta_log_version += 1
+
+    def _worker_classifier(self, classifier_key):
+        """
+        This method returns a broadcast classifier in a worker, unpickling it on first use.
+        """
+        classifier = classifiers[classifier_key]
+        if isinstance(classifier, bytes):
+            classifier = classifiers[classifier_key] = pickle.loads(classifier)
+        return classifier
+
+    def _feature_generator_worker(self, cell_list, version):
+        """
+        This method generates features for a chunk of data cells in a worker of the pool.
+        """
+        self._apply_deltas(version)
+        return self._feature_generator_process(cell_list)
+
+    def _prediction_worker(self, cell_list, version, classifier_key, all_ones, all_zeros):
+        """
+        This method predicts corrections for a chunk of data cells in a worker of the pool.
+        """
+        self._apply_deltas(version)
+        classifier = None if classifier_key is None else self._worker_classifier(classifier_key)
+        return self._prediction_process(cell_list, all_ones, all_zeros, dataset=d, cls_model=classifier)
+
     def _feature_generator_process(self, cell_list, dataset=None):
         """
         This method generates features for each data column in a parallel process.
@@ -500,9 +674,17 @@ class Correction:
 
         for cell in filter(lambda cell: cell is not None, cell_list):
             error_dictionary = {"column": cell[1], "old_value": d.dataframe.iloc[cell], "vicinity": list(d.dataframe.iloc[cell[0], :])}
-            value_corrections = self._value_based_corrector(d.value_models, error_dictionary)
-            vicinity_corrections = self._vicinity_based_corrector(d.vicinity_models, error_dictionary)
-            domain_corrections = self._domain_based_corrector(d.domain_models, error_dictionary)
+            # The value-based corrections only depend on the erroneous value and the domain-based ones on the column, so
+            # both are memoized until update_models changes their models.
+            if error_dictionary["old_value"] not in d.value_corrections_memo:
+                d.value_corrections_memo[error_dictionary["old_value"]] = self._value_based_corrector(
+                    d.value_models, error_dictionary)
+            value_corrections = d.value_corrections_memo[error_dictionary["old_value"]]
+            vicinity_corrections = self._vicinity_based_corrector(d.vicinity_models, error_dictionary,
+                                                                  d.vicinity_corrections_memo)
+            if cell[1] not in d.domain_corrections_memo:
+                d.domain_corrections_memo[cell[1]] = self._domain_based_corrector(d.domain_models, error_dictionary)
+            domain_corrections = d.domain_corrections_memo[cell[1]]
             models_corrections = value_corrections + vicinity_corrections + domain_corrections
             corrections_features = {}
             for mi, model in enumerate(models_corrections):
@@ -526,17 +708,18 @@ class Correction:
         if len(cells) == 0:
             yield {}, []
         else:
-            pool = Pool(max(self.NUM_WORKERS-1, 1), initargs=(d,), initializer=worker_init_feat_generation)
+            pool = self._worker_pool(d)
             pairs_counter = 0
             process_args_generator = itertools.zip_longest(*[iter(cells)] * self.CHUNK_SIZE)
 
-            feature_generation_iterator = pool.imap(self._feature_generator_process, process_args_generator)
+            feature_generation_iterator = pool.imap(
+                functools.partial(self._feature_generator_worker, version=self._delta_log_version),
+                process_args_generator)
 
             for pairs_counter_out, pair_features_out, cell_list in feature_generation_iterator:
                 pairs_counter += pairs_counter_out
                 yield pair_features_out, cell_list
 
-            pool.close()
             if self.VERBOSE:
                 print("{} pairs of (a data error, a potential correction) are featurized.".format(pairs_counter))
 
@@ -556,21 +739,27 @@ class Correction:
             classification_model = cls_model
         
         correction_dict = {}
+        if all_zeros:
+            return correction_dict
+
+        # The pairs of all cells of the chunk are featurized at once and classified with one stacked feature matrix.
+        _, pair_features, cells = self._feature_generator_process(cell_list, dataset=d)
+        corrections = [correction for cell in cells for correction in pair_features[cell]]
+        if not corrections:
+            return correction_dict
+        if all_ones:
+            predictions = numpy.ones(len(corrections))
+        else:
+            feature_matrix = numpy.array([features for cell in cells for features in pair_features[cell].values()])
+            predictions = classification_model.predict(feature_matrix)
 
-        for cell in filter(lambda cell: cell is not None, cell_list):
-            _, pair_features, _ = self._feature_generator_process([cell], dataset=d)
-            
-            if all_ones:
-                predictions = numpy.ones(len(pair_features[cell]))
-            elif all_zeros:
-                continue
-            else:
-                predictions = classification_model.predict(list(pair_features[cell].values()))
-
-            dict_keys = list(pair_features[cell].keys())
-            for index, predicted_label in enumerate(predictions):
-                if predicted_label:
-                    correction_dict[cell] = dict_keys[index]
+        pair_index = 0
+        for cell in cells:
+            for correction in pair_features[cell]:
+                # The last positively predicted correction of a cell is chosen.
+                if predictions[pair_index]:
+                    correction_dict[cell] = correction
+                pair_index += 1
 
         return correction_dict
                 
@@ -579,19 +768,23 @@ class Correction:
         """
         This method predicts the correction for each data error in a parallel process.
         """
-        pool = Pool(self.NUM_WORKERS,initargs=(d,classification_model), initializer=worker_init_prediction)
+        pool = self._worker_pool(d)
+        classifier_key = None
+        if used_cells_test and not all_zeros and not all_ones:
+            classifier_key = self._delta_log_version
+            self._broadcast(["classifier", [classifier_key, pickle.dumps(classification_model)]])
 
         prediction_args_generator = itertools.zip_longest(*[iter(used_cells_test)] * self.CHUNK_SIZE)
 
-        correction_iterator = pool.imap(functools.partial(self._prediction_process, all_zeros=all_zeros, all_ones=all_ones), prediction_args_generator)
+        correction_iterator = pool.imap(functools.partial(
+            self._prediction_worker, version=self._delta_log_version, classifier_key=classifier_key,
+            all_zeros=all_zeros, all_ones=all_ones), prediction_args_generator)
 
         for i, correction_dict in enumerate(correction_iterator):
             d.corrected_cells.update(correction_dict)
             if self.VERBOSE:
                 print(f"{i*self.CHUNK_SIZE}/{len(used_cells_test)} predicted correction", end="\r")
 
-        pool.close()
-        
     def predict_corrections(self, d):
         """
         This method predicts corrections for each data error.
@@ -695,18 +888,21 @@ class Correction:
             print("------------------------------------------------------------------------\n"
                   "--------------Iterative Tuple Sampling, Labeling, and Learning----------\n"
                   "------------------------------------------------------------------------")
-        while len(d.labeled_tuples) < self.LABELING_BUDGET:
-            if self.VERBOSE:
-                print(f"Label round {len(d.labeled_tuples)+1}/{self.LABELING_BUDGET}")
-            self.sample_tuple(d)
-            if d.has_ground_truth:
-                self.label_with_ground_truth(d)
-            # else:
-            #   In this case, user should label the tuple interactively as shown in the Jupyter notebook.
-            self.update_models(d)
-            self.predict_corrections(d)
-            if self.VERBOSE:
-                print("------------------------------------------------------------------------")
+        try:
+            while len(d.labeled_tuples) < self.LABELING_BUDGET:
+                if self.VERBOSE:
+                    print(f"Label round {len(d.labeled_tuples)+1}/{self.LABELING_BUDGET}")
+                self.sample_tuple(d)
+                if d.has_ground_truth:
+                    self.label_with_ground_truth(d)
+                # else:
+                #   In this case, user should label the tuple interactively as shown in the Jupyter notebook.
+                self.update_models(d)
+                self.predict_corrections(d)
+                if self.VERBOSE:
+                    print("------------------------------------------------------------------------")
+        finally:
+            self.close_worker_pool()
         if self.SAVE_RESULTS:
             if self.VERBOSE:
                 print("------------------------------------------------------------------------\n"
@@ -13,19 +13,20 @@
 import os
 import re
 import sys
+import copy
 import math
 import time
 import json
 import random
 import pickle
-import hashlib
-import tempfile
 import itertools
-from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import numpy
 import pandas
 import scipy.stats
+import scipy.sparse
 import scipy.spatial
 import scipy.cluster
 import sklearn.svm
@@ -43,6 +44,67 @@ import raha
 from raha.load_dataset import Dataset
 ########################################
 
+worker_dataset = None
+
+
+def share_dataframe(dataframe):
+    """
+    This method copies the values of a dataframe into one shared memory block. The block starts with the int64 offsets
+    of all cells in row-major order, followed by the UTF-8 encoded values.
+    """
+    encoded_values = [str(value).encode("utf-8") for value in dataframe.to_numpy().ravel().tolist()]
+    offsets = numpy.zeros(len(encoded_values) + 1, dtype=numpy.int64)
+    numpy.cumsum([len(value) for value in encoded_values], out=offsets[1:])
+    shared_memory = SharedMemory(create=True, size=max(offsets.nbytes + int(offsets[-1]), 1))
+    shared_memory.buf[:offsets.nbytes] = offsets.tobytes()
+    shared_memory.buf[offsets.nbytes:offsets.nbytes + int(offsets[-1])] = b"".join(encoded_values)
+    return shared_memory
+
+
+def read_shared_dataframe(shared_memory_name, shape, columns):
+    """
+    This method rebuilds a dataframe from a shared memory block written by share_dataframe.
+    """
+    shared_memory = SharedMemory(name=shared_memory_name)
+    offsets_size = (shape[0] * shape[1] + 1) * numpy.dtype(numpy.int64).itemsize
+    offsets = numpy.frombuffer(bytes(shared_memory.buf[:offsets_size]), dtype=numpy.int64).tolist()
+    payload = bytes(shared_memory.buf[offsets_size:offsets_size + offsets[-1]])
+    shared_memory.close()
+    values = [payload[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])]
+    return pandas.DataFrame(numpy.array(values, dtype=object).reshape(shape), columns=columns)
+
+
+def worker_init_strategies(dataset, shared_memory_name, shape, columns):
+    global worker_dataset
+    worker_dataset = dataset
+    worker_dataset.dataframe = read_shared_dataframe(shared_memory_name, shape, columns)
+
+
+class ColumnClustering:
+    """
+    The clusters of the data cells of one column, stored as one int32 cluster label per row. A column whose cells could
+    not be clustered has no labels and no clusters.
+    """
+
+    def __init__(self, labels):
+        self.labels = numpy.asarray(labels, dtype=numpy.int32)
+        self.clusters_count = int(self.labels.max()) + 1 if len(self.labels) > 0 else 0
+        self._cluster_order = None
+        self._cluster_offsets = None
+
+    def __len__(self):
+        return self.clusters_count
+
+    def rows(self, c):
+        """
+        This method returns the rows of cluster c in ascending order. The row index of all clusters is built lazily.
+        """
+        if self._cluster_order is None:
+            self._cluster_order = numpy.argsort(self.labels, kind="stable")
+            self._cluster_offsets = numpy.zeros(self.clusters_count + 1, dtype=int)
+            numpy.cumsum(numpy.bincount(self.labels, minlength=self.clusters_count), out=self._cluster_offsets[1:])
+        return self._cluster_order[self._cluster_offsets[c]:self._cluster_offsets[c + 1]]
+
 
 ########################################
 class Detection:
@@ -62,32 +124,29 @@ class Detection:
         self.STRATEGY_FILTERING = False
         self.CLASSIFICATION_MODEL = "GBC"  # ["ABC", "DTC", "GBC", "GNB", "SGDC", "SVC"]
         self.LABEL_PROPAGATION_METHOD = "homogeneity"   # ["homogeneity", "majority"]
+        self.INCREMENTAL_LABEL_PROPAGATION = True
         self.ERROR_DETECTION_ALGORITHMS = ["OD", "PVD", "RVD", "KBVD"]   # ["OD", "PVD", "RVD", "KBVD", "TFIDF"]
         self.HISTORICAL_DATASETS = []
+        self.DATASET_TRANSPORT = "shared_memory"   # ["shared_memory", "pickle"]
+        self.NUM_WORKERS = os.cpu_count()
+        self.CLASSIFICATION_POOL = "process"   # ["process", "thread"]
+        self.CLASSIFICATION_SEED = 0   # Seeds randomized classifiers per column; None leaves them unseeded.
+        self.STRATEGY_CACHE_PATH = None   # Folder of the strategy output cache shared by all scenarios and versions.
 
     def _strategy_runner_process(self, args):
         """
         This method runs an error detection strategy in a parallel process.
         """
-        d, algorithm, configuration = args
+        if len(args) == 3:
+            d, algorithm, configuration = args
+        else:
+            d = worker_dataset
+            algorithm, configuration = args
         start_time = time.time()
         strategy_name = json.dumps([algorithm, configuration])
-        strategy_name_hash = str(int(hashlib.sha1(strategy_name.encode("utf-8")).hexdigest(), 16))
         outputted_cells = {}
         if algorithm == "OD":
-            dataset_path = os.path.join(tempfile.gettempdir(), d.name + "-" + strategy_name_hash + ".csv")
-            d.write_csv_dataset(dataset_path, d.dataframe)
-            params = ["-F", ",", "--statistical", "0.5"] + ["--" + configuration[0]] + configuration[1:] + [dataset_path]
-            raha.tools.dBoost.dboost.imported_dboost.run(params)
-            algorithm_results_path = dataset_path + "-dboost_output.csv"
-            if os.path.exists(algorithm_results_path):
-                ocdf = pandas.read_csv(algorithm_results_path, sep=",", header=None, encoding="utf-8", dtype=str,
-                                       keep_default_na=False, low_memory=False).apply(lambda x: x.str.strip())
-                for i, j in ocdf.values.tolist():
-                    if int(i) > 0:
-                        outputted_cells[(int(i) - 1, int(j))] = ""
-                os.remove(algorithm_results_path)
-            os.remove(dataset_path)
+            outputted_cells = self._outlier_cells(d, [configuration])[0]
         elif algorithm == "PVD":
             attribute, ch = configuration
             j = d.dataframe.columns.get_loc(attribute)
@@ -99,19 +158,7 @@ class Detection:
                     continue
         elif algorithm == "RVD":
             l_attribute, r_attribute = configuration
-            l_j = d.dataframe.columns.get_loc(l_attribute)
-            r_j = d.dataframe.columns.get_loc(r_attribute)
-            value_dictionary = {}
-            for i, row in d.dataframe.iterrows():
-                if row[l_attribute]:
-                    if row[l_attribute] not in value_dictionary:
-                        value_dictionary[row[l_attribute]] = {}
-                    if row[r_attribute]:
-                        value_dictionary[row[l_attribute]][row[r_attribute]] = 1
-            for i, row in d.dataframe.iterrows():
-                if row[l_attribute] in value_dictionary and len(value_dictionary[row[l_attribute]]) > 1:
-                    outputted_cells[(i, l_j)] = ""
-                    outputted_cells[(i, r_j)] = ""
+            outputted_cells = self._rule_violation_cells(d, l_attribute, [r_attribute])[r_attribute]
         elif algorithm == "KBVD":
             outputted_cells = raha.tools.KATARA.katara.run(d, configuration)
         detected_cells_list = list(outputted_cells.keys())
@@ -120,20 +167,158 @@ class Detection:
             "output": detected_cells_list,
             "runtime": time.time() - start_time
         }
-        if self.SAVE_RESULTS:
-            pickle.dump(strategy_profile, open(os.path.join(d.results_folder, "strategy-profiling",
-                                                            strategy_name_hash + ".dictionary"), "wb"))
-        if self.VERBOSE:
-            print("{} cells are detected by {}.".format(len(detected_cells_list), strategy_name))
+        self._report_strategy_profile(strategy_profile)
         return strategy_profile
 
+    @staticmethod
+    def _outlier_cells(d, configuration_list):
+        """
+        This method runs dBoost in memory on the dataset for a list of OD configurations that share one feature
+        expansion and one statistical analyzer. As in dBoost's CSV output, the header is its first tuple.
+        """
+        outlier_cells_list = raha.tools.dBoost.dboost.imported_dboost.run_dataframe(
+            d.dataframe, configuration_list, ["statistical", "0.5"])
+        outputted_cells_list = []
+        for outlier_cells in outlier_cells_list:
+            outputted_cells = {}
+            for i, j in outlier_cells:
+                if i > 0:
+                    outputted_cells[(i - 1, j)] = ""
+            outputted_cells_list.append(outputted_cells)
+        return outputted_cells_list
+
+    def _outlier_detection_strategies_runner(self, d, configuration_list):
+        """
+        This method runs a batch of OD strategies, fitting dBoost's feature expansion and analyzer once for all of them.
+        """
+        start_time = time.time()
+        outputted_cells_list = self._outlier_cells(d, configuration_list)
+        runtime = (time.time() - start_time) / len(configuration_list)
+        strategy_profiles_list = []
+        for configuration, outputted_cells in zip(configuration_list, outputted_cells_list):
+            strategy_profile = {
+                "name": json.dumps(["OD", configuration]),
+                "output": list(outputted_cells.keys()),
+                "runtime": runtime
+            }
+            self._report_strategy_profile(strategy_profile)
+            strategy_profiles_list.append(strategy_profile)
+        return strategy_profiles_list
+
+    def _pattern_violation_strategies_runner(self, d, configuration_list):
+        """
+        This method runs a batch of PVD strategies. Each column is scanned once to index the rows containing each
+        character, and every strategy profile of the batch is read off that index.
+        """
+        start_time = time.time()
+        character_rows_per_attribute = {}
+        for attribute, _ in configuration_list:
+            if attribute not in character_rows_per_attribute:
+                character_rows = {}
+                for i, value in enumerate(d.dataframe[attribute].tolist()):
+                    if isinstance(value, str):
+                        for ch in set(value):
+                            character_rows.setdefault(ch, []).append(i)
+                character_rows_per_attribute[attribute] = character_rows
+        runtime = (time.time() - start_time) / len(configuration_list)
+        strategy_profiles_list = []
+        for attribute, ch in configuration_list:
+            start_time = time.time()
+            j = d.dataframe.columns.get_loc(attribute)
+            try:
+                re.compile("[" + ch + "]", re.UNICODE)
+                detected_rows = character_rows_per_attribute[attribute].get(ch, [])
+            except re.error:
+                # The single strategy matches values with this character class, which fails for every value.
+                detected_rows = []
+            strategy_profile = {
+                "name": json.dumps(["PVD", [attribute, ch]]),
+                "output": [(i, j) for i in detected_rows],
+                "runtime": runtime + time.time() - start_time
+            }
+            self._report_strategy_profile(strategy_profile)
+            strategy_profiles_list.append(strategy_profile)
+        return strategy_profiles_list
+
+    @staticmethod
+    def _rule_violation_cells(d, l_attribute, r_attributes):
+        """
+        This method evaluates the RVD strategies of one left attribute in a single sweep. For each right attribute, it
+        returns the cells of all tuples whose non-empty left value co-occurs with more than one distinct non-empty right
+        value.
+        """
+        dataframe = d.dataframe.where(d.dataframe != "")
+        l_j = d.dataframe.columns.get_loc(l_attribute)
+        l_present = dataframe[l_attribute].notna().to_numpy()
+        distinct_counts = dataframe.loc[l_present, [l_attribute] + list(r_attributes)].groupby(
+            l_attribute, sort=False).nunique()
+        tuple_distinct_counts = distinct_counts.reindex(dataframe[l_attribute])
+        outputted_cells_per_attribute = {}
+        for r_attribute in r_attributes:
+            r_j = d.dataframe.columns.get_loc(r_attribute)
+            violating_rows = numpy.flatnonzero(tuple_distinct_counts[r_attribute].to_numpy() > 1)
+            outputted_cells = {}
+            for i in violating_rows.tolist():
+                outputted_cells[(i, l_j)] = ""
+                outputted_cells[(i, r_j)] = ""
+            outputted_cells_per_attribute[r_attribute] = outputted_cells
+        return outputted_cells_per_attribute
+
+    def _rule_violation_strategies_runner(self, d, configuration_list):
+        """
+        This method runs a batch of RVD strategies, evaluating all strategies that share a left attribute together.
+        """
+        r_attributes_per_attribute = {}
+        for l_attribute, r_attribute in configuration_list:
+            r_attributes_per_attribute.setdefault(l_attribute, []).append(r_attribute)
+        strategy_profiles_list = []
+        for l_attribute, r_attributes in r_attributes_per_attribute.items():
+            start_time = time.time()
+            outputted_cells_per_attribute = self._rule_violation_cells(d, l_attribute, r_attributes)
+            runtime = (time.time() - start_time) / len(r_attributes)
+            for r_attribute in r_attributes:
+                strategy_profile = {
+                    "name": json.dumps(["RVD", [l_attribute, r_attribute]]),
+                    "output": list(outputted_cells_per_attribute[r_attribute].keys()),
+                    "runtime": runtime
+                }
+                self._report_strategy_profile(strategy_profile)
+                strategy_profiles_list.append(strategy_profile)
+        return strategy_profiles_list
+
+    def _strategies_runner_process(self, args):
+        """
+        This method runs a batch of error detection strategies of one algorithm in a parallel process.
+        """
+        if len(args) == 3:
+            d, algorithm, configuration_list = args
+        else:
+            d = worker_dataset
+            algorithm, configuration_list = args
+        if algorithm == "OD":
+            return self._outlier_detection_strategies_runner(d, configuration_list)
+        if algorithm == "PVD":
+            return self._pattern_violation_strategies_runner(d, configuration_list)
+        if algorithm == "RVD":
+            return self._rule_violation_strategies_runner(d, configuration_list)
+        return [self._strategy_runner_process([d, algorithm, configuration]) for configuration in configuration_list]
+
+    def _report_strategy_profile(self, strategy_profile):
+        """
+        This method reports the output of a strategy. The strategy profiles are stored by the parent process.
+        """
+        if self.VERBOSE:
+            print("{} cells are detected by {}.".format(len(strategy_profile["output"]), strategy_profile["name"]))
+
     def initialize_dataset(self, d):
         """
         This method instantiates the dataset.
         """
         # d = raha.dataset.Dataset(dd)
         # d.dictionary = dd
-        d.results_folder = os.path.join('./', "raha-baran-results-" + d.name)
+        results_folder_name = "-".join(
+            [d.name] + [str(getattr(d, a)) for a in ["scenario", "version"] if getattr(d, a, "") != ""])
+        d.results_folder = os.path.join('./', "raha-baran-results-" + results_folder_name)
         if self.SAVE_RESULTS and not os.path.exists(d.results_folder):
             os.mkdir(d.results_folder)
         d.labeled_tuples = {} if not hasattr(d, "labeled_tuples") else d.labeled_tuples
@@ -150,11 +335,12 @@ class Detection:
         if not self.STRATEGY_FILTERING:
             if os.path.exists(sp_folder_path):
                 sys.stderr.write("I just load strategies' results as they have already been run on the dataset!\n")
-                strategy_profiles_list = [pickle.load(open(os.path.join(sp_folder_path, strategy_file), "rb"))
-                                          for strategy_file in os.listdir(sp_folder_path)]
+                strategy_profiles_list = raha.StrategyProfileStore(sp_folder_path).load()
             else:
+                strategy_store = None
                 if self.SAVE_RESULTS:
                     os.mkdir(sp_folder_path)
+                    strategy_store = raha.StrategyProfileStore(sp_folder_path)
                 algorithm_and_configurations = []
                 for algorithm_name in self.ERROR_DETECTION_ALGORITHMS:
                     if algorithm_name == "OD":
@@ -164,32 +350,48 @@ class Detection:
                                                    ["0.1", "0.3", "0.5", "0.7", "0.9"])) +
                             list(itertools.product(["gaussian"],
                                                    ["1.0", "1.3", "1.5", "1.7", "2.0", "2.3", "2.5", "2.7", "3.0"]))]
-                        algorithm_and_configurations.extend(
-                            [[d, algorithm_name, configuration] for configuration in configuration_list])
+                        algorithm_and_configurations.append([algorithm_name, configuration_list])
                     elif algorithm_name == "PVD":
-                        configuration_list = []
                         for attribute in d.dataframe.columns:
                             column_data = "".join(d.dataframe[attribute].tolist())
                             characters_dictionary = {ch: 1 for ch in column_data}
-                            for ch in characters_dictionary:
-                                configuration_list.append([attribute, ch])
-                        algorithm_and_configurations.extend(
-                            [[d, algorithm_name, configuration] for configuration in configuration_list])
+                            configuration_list = [[attribute, ch] for ch in characters_dictionary]
+                            if configuration_list:
+                                algorithm_and_configurations.append([algorithm_name, configuration_list])
                     elif algorithm_name == "RVD":
                         al = d.dataframe.columns.tolist()
-                        configuration_list = [[a, b] for (a, b) in itertools.product(al, al) if a != b]
-                        algorithm_and_configurations.extend(
-                            [[d, algorithm_name, configuration] for configuration in configuration_list])
+                        for a in al:
+                            configuration_list = [[a, b] for b in al if a != b]
+                            if configuration_list:
+                                algorithm_and_configurations.append([algorithm_name, configuration_list])
                     elif algorithm_name == "KBVD":
                         configuration_list = [
                             os.path.join(os.path.dirname(__file__), "tools", "KATARA", "knowledge-base", pat)
                             for pat in os.listdir(os.path.join(os.path.dirname(__file__), "tools", "KATARA", "knowledge-base"))]
                         algorithm_and_configurations.extend(
-                            [[d, algorithm_name, configuration] for configuration in configuration_list])
+                            [[algorithm_name, [configuration]] for configuration in configuration_list])
                 random.shuffle(algorithm_and_configurations)
 
-                with ProcessPoolExecutor() as executor:
-                    strategy_profiles_list = list(executor.map(self._strategy_runner_process, algorithm_and_configurations))
+                strategy_cache = None
+                cached_strategy_profiles = []
+                if self.STRATEGY_CACHE_PATH is not None:
+                    strategy_cache = raha.StrategyOutputCache(os.path.join(self.STRATEGY_CACHE_PATH, d.name))
+                    d.column_hashes = raha.StrategyOutputCache.column_hashes(d.dataframe)
+                    d.knowledge_base_hashes = {}
+                    cached_strategy_profiles, algorithm_and_configurations = self._load_cached_strategies(
+                        d, strategy_cache, algorithm_and_configurations)
+                    if strategy_store is not None:
+                        strategy_store.append(cached_strategy_profiles)
+                if self.DATASET_TRANSPORT == "shared_memory":
+                    strategy_profiles_batches = self._run_strategies_with_shared_dataset(
+                        d, algorithm_and_configurations, strategy_store, strategy_cache)
+                else:
+                    with ProcessPoolExecutor() as executor:
+                        strategy_profiles_batches = self._collect_strategy_profiles(d, executor.map(
+                            self._strategies_runner_process, [[d] + ac for ac in algorithm_and_configurations]),
+                            strategy_store, strategy_cache)
+                strategy_profiles_list = cached_strategy_profiles + [sp for batch in strategy_profiles_batches
+                                                                     for sp in batch]
         else:
             for dd in self.HISTORICAL_DATASETS + [d.dictionary]:
                 raha.utilities.dataset_profiler(dd)
@@ -199,28 +401,123 @@ class Detection:
         if self.VERBOSE:
             print("{} strategy profiles are collected.".format(len(d.strategy_profiles)))
 
+    @staticmethod
+    def _strategy_cache_key(d, algorithm, configuration):
+        """
+        This method returns the key of a strategy in the strategy output cache. It covers the columns the strategy
+        reads: one column for PVD, the two columns of the rule for RVD, and the whole dataset for OD and KBVD. KBVD keys
+        also cover the contents of the knowledge base file.
+        """
+        if algorithm == "PVD":
+            attributes = [configuration[0]]
+        elif algorithm == "RVD":
+            attributes = list(configuration)
+        else:
+            attributes = d.dataframe.columns.tolist()
+        if algorithm == "KBVD":
+            if configuration not in d.knowledge_base_hashes:
+                d.knowledge_base_hashes[configuration] = raha.StrategyOutputCache.file_hash(configuration)
+            configuration = [os.path.basename(configuration), d.knowledge_base_hashes[configuration]]
+        return raha.StrategyOutputCache.key(algorithm, configuration, [d.column_hashes[a] for a in attributes])
+
+    def _load_cached_strategies(self, d, strategy_cache, algorithm_and_configurations):
+        """
+        This method takes the strategies whose outputs are in the strategy output cache out of the batches to run. It
+        returns their strategy profiles and the remaining batches.
+        """
+        cached_strategy_profiles = []
+        remaining_algorithm_and_configurations = []
+        for algorithm, configuration_list in algorithm_and_configurations:
+            remaining_configuration_list = []
+            for configuration in configuration_list:
+                cached_output = strategy_cache.get(self._strategy_cache_key(d, algorithm, configuration))
+                if cached_output is None:
+                    remaining_configuration_list.append(configuration)
+                else:
+                    strategy_profile = {
+                        "name": json.dumps([algorithm, configuration]),
+                        "output": cached_output["output"],
+                        "runtime": cached_output["runtime"]
+                    }
+                    self._report_strategy_profile(strategy_profile)
+                    cached_strategy_profiles.append(strategy_profile)
+            if remaining_configuration_list:
+                remaining_algorithm_and_configurations.append([algorithm, remaining_configuration_list])
+        if self.VERBOSE:
+            print("{} strategy outputs are loaded from the cache.".format(len(cached_strategy_profiles)))
+        return cached_strategy_profiles, remaining_algorithm_and_configurations
+
+    def _collect_strategy_profiles(self, d, strategy_profiles_batches, strategy_store, strategy_cache=None):
+        """
+        This method collects the batches of strategy profiles as the workers return them and appends each batch to the
+        strategy profile store and the strategy output cache, if any.
+        """
+        collected_batches = []
+        for strategy_profiles_batch in strategy_profiles_batches:
+            if strategy_store is not None:
+                strategy_store.append(strategy_profiles_batch)
+            if strategy_cache is not None:
+                strategy_cache.put((self._strategy_cache_key(d, *json.loads(sp["name"])), sp)
+                                   for sp in strategy_profiles_batch)
+            collected_batches.append(strategy_profiles_batch)
+        return collected_batches
+
+    def _run_strategies_with_shared_dataset(self, d, algorithm_and_configurations, strategy_store=None,
+                                            strategy_cache=None):
+        """
+        This method runs the strategies in worker processes that read the dataframe once from shared memory instead of
+        receiving the pickled dataset with every strategy.
+        """
+        dataset_skeleton = copy.copy(d)
+        dataset_skeleton.dataframe = None
+        if hasattr(d, "clean_dataframe"):
+            dataset_skeleton.clean_dataframe = None
+        if hasattr(d, "repaired_dataframe"):
+            dataset_skeleton.repaired_dataframe = None
+        shared_memory = share_dataframe(d.dataframe)
+        try:
+            with ProcessPoolExecutor(initializer=worker_init_strategies,
+                                     initargs=(dataset_skeleton, shared_memory.name, d.dataframe.shape,
+                                               d.dataframe.columns.tolist())) as executor:
+                strategy_profiles_batches = self._collect_strategy_profiles(
+                    d, executor.map(self._strategies_runner_process, algorithm_and_configurations), strategy_store,
+                    strategy_cache)
+        finally:
+            shared_memory.close()
+            shared_memory.unlink()
+        return strategy_profiles_batches
+
     def generate_features(self, d):
         """
         This method generates features.
         """
+        cells_list = [numpy.zeros((0, 2), dtype=int)]
+        strategy_indices_list = [numpy.zeros(0, dtype=int)]
+        for strategy_index, strategy_profile in enumerate(d.strategy_profiles):
+            strategy_name = json.loads(strategy_profile["name"])[0]
+            if strategy_name in self.ERROR_DETECTION_ALGORITHMS and len(strategy_profile["output"]) > 0:
+                cells_list.append(numpy.array(strategy_profile["output"], dtype=int).reshape(-1, 2))
+                strategy_indices_list.append(numpy.full(len(strategy_profile["output"]), strategy_index))
+        cells = numpy.concatenate(cells_list)
+        strategy_indices = numpy.concatenate(strategy_indices_list)
+        column_order = numpy.argsort(cells[:, 1], kind="stable")
+        column_offsets = numpy.searchsorted(cells[column_order, 1], numpy.arange(d.dataframe.shape[1] + 1))
         columns_features_list = []
         for j in range(d.dataframe.shape[1]):
-            feature_vectors = numpy.zeros((d.dataframe.shape[0], len(d.strategy_profiles)))
-            for strategy_index, strategy_profile in enumerate(d.strategy_profiles):
-                strategy_name = json.loads(strategy_profile["name"])[0]
-                if strategy_name in self.ERROR_DETECTION_ALGORITHMS:
-                    for cell in strategy_profile["output"]:
-                        if cell[1] == j:
-                            feature_vectors[cell[0], strategy_index] = 1.0
+            column_cells = column_order[column_offsets[j]:column_offsets[j + 1]]
+            feature_vectors = scipy.sparse.csr_matrix(
+                (numpy.ones(len(column_cells)), (cells[column_cells, 0], strategy_indices[column_cells])),
+                shape=(d.dataframe.shape[0], len(d.strategy_profiles)))
+            feature_vectors.data[:] = 1.0
             if "TFIDF" in self.ERROR_DETECTION_ALGORITHMS:
                 vectorizer = sklearn.feature_extraction.text.TfidfVectorizer(min_df=1, stop_words="english")
                 corpus = d.dataframe.iloc[:, j]
                 try:
                     tfidf_features = vectorizer.fit_transform(corpus)
-                    feature_vectors = numpy.column_stack((feature_vectors, numpy.array(tfidf_features.todense())))
+                    feature_vectors = scipy.sparse.hstack([feature_vectors, tfidf_features], format="csr")
                 except:
                     pass
-            non_identical_columns = numpy.any(feature_vectors != feature_vectors[0, :], axis=0)
+            non_identical_columns = (feature_vectors.max(axis=0) != feature_vectors.min(axis=0)).toarray().ravel()
             feature_vectors = feature_vectors[:, non_identical_columns]
             if self.VERBOSE:
                 print("{} Features are generated for column {}.".format(feature_vectors.shape[1], j))
@@ -234,28 +531,21 @@ class Detection:
         clustering_results = []
         for j in range(d.dataframe.shape[1]):
             feature_vectors = d.column_features[j]
-            clusters_k_c_ce = {k: {} for k in range(2, self.LABELING_BUDGET + 2)}
-            cells_clusters_k_ce = {k: {} for k in range(2, self.LABELING_BUDGET + 2)}
+            clusterings_k = {k: ColumnClustering([]) for k in range(2, self.LABELING_BUDGET + 2)}
             try:
-                clustering_model = scipy.cluster.hierarchy.linkage(feature_vectors, method="average", metric="cosine")
-                for k in clusters_k_c_ce:
-                    model_labels = [l - 1 for l in
-                                    scipy.cluster.hierarchy.fcluster(clustering_model, k, criterion="maxclust")]
-                    for index, c in enumerate(model_labels):
-                        if c not in clusters_k_c_ce[k]:
-                            clusters_k_c_ce[k][c] = {}
-                        cell = (index, j)
-                        clusters_k_c_ce[k][c][cell] = 1
-                        cells_clusters_k_ce[k][cell] = c
+                clustering_model = scipy.cluster.hierarchy.linkage(feature_vectors.toarray(), method="average",
+                                                                   metric="cosine")
+                for k in clusterings_k:
+                    clusterings_k[k] = ColumnClustering(
+                        scipy.cluster.hierarchy.fcluster(clustering_model, k, criterion="maxclust") - 1)
             except:
                 pass
             if self.VERBOSE:
                 print("A hierarchical clustering model is built for column {}.".format(j))
-            clustering_results.append([clusters_k_c_ce, cells_clusters_k_ce])
-        d.clusters_k_j_c_ce = {k: {j: clustering_results[j][0][k] for j in range(d.dataframe.shape[1])} for k in
-                               range(2, self.LABELING_BUDGET + 2)}
-        d.cells_clusters_k_j_ce = {k: {j: clustering_results[j][1][k] for j in range(d.dataframe.shape[1])} for k in
-                                   range(2, self.LABELING_BUDGET + 2)}
+            clustering_results.append(clusterings_k)
+        d.clusterings_k_j = {k: {j: clustering_results[j][k] for j in range(d.dataframe.shape[1])} for k in
+                             range(2, self.LABELING_BUDGET + 2)}
+        d.extended_labels_j = None
 
     def sample_tuple(self, d):
         """
@@ -263,25 +553,32 @@ class Detection:
         """
         # --------------------Calculating Number of Labels per Clusters--------------------
         k = len(d.labeled_tuples) + 2
+        labeled_rows = numpy.zeros(d.dataframe.shape[0], dtype=bool)
+        labeled_rows[list(d.labeled_tuples)] = True
         for j in range(d.dataframe.shape[1]):
-            for c in d.clusters_k_j_c_ce[k][j]:
-                d.labels_per_cluster[(j, c)] = {cell: d.labeled_cells[cell][0] for cell in d.clusters_k_j_c_ce[k][j][c] if
-                                                cell[0] in d.labeled_tuples}
+            clustering = d.clusterings_k_j[k][j]
+            for c in range(len(clustering)):
+                rows = clustering.rows(c)
+                d.labels_per_cluster[(j, c)] = {(i, j): d.labeled_cells[(i, j)][0] for i in
+                                                rows[labeled_rows[rows]].tolist()}
         # --------------------Sampling a Tuple--------------------
         if self.CLUSTERING_BASED_SAMPLING:
-            tuple_score = numpy.zeros(d.dataframe.shape[0])
-            for i in range(d.dataframe.shape[0]):
-                if i not in d.labeled_tuples:
-                    score = 0.0
-                    for j in range(d.dataframe.shape[1]):
-                        if d.clusters_k_j_c_ce[k][j]:
-                            cell = (i, j)
-                            c = d.cells_clusters_k_j_ce[k][j][cell]
-                            score += math.exp(-len(d.labels_per_cluster[(j, c)]))
-                    tuple_score[i] = math.exp(score)
+            # The scores are accumulated column by column and exponentiated with math.exp, exactly as cell by cell.
+            score = numpy.zeros(d.dataframe.shape[0])
+            for j in range(d.dataframe.shape[1]):
+                clustering = d.clusterings_k_j[k][j]
+                if len(clustering) > 0:
+                    labels_count = numpy.bincount(clustering.labels[labeled_rows], minlength=len(clustering))
+                    unique_counts, counts_inverse = numpy.unique(labels_count, return_inverse=True)
+                    cluster_score = numpy.array([math.exp(-count) for count in unique_counts.tolist()])
+                    score += cluster_score[counts_inverse][clustering.labels]
+            unique_scores, scores_inverse = numpy.unique(score, return_inverse=True)
+            tuple_score = numpy.array([math.exp(s) for s in unique_scores.tolist()])[scores_inverse]
+            tuple_score[labeled_rows] = 0.0
         else:
             tuple_score = numpy.ones(d.dataframe.shape[0])
-        sum_tuple_score = sum(tuple_score)
+        # Sequential summation, as the built-in sum over the tuple scores.
+        sum_tuple_score = numpy.cumsum(tuple_score)[-1]
         p_tuple_score = tuple_score / sum_tuple_score
         d.sampled_tuple = numpy.random.choice(numpy.arange(d.dataframe.shape[0]), 1, p=p_tuple_score)[0]
         if self.VERBOSE:
@@ -294,10 +591,10 @@ class Detection:
         k = len(d.labeled_tuples) + 2
         d.labeled_tuples[d.sampled_tuple] = 1
         #actual_errors_dictionary = d.get_actual_errors_dictionary()
-        actual_errors_dictionary = d._get_actual_errors_dictionary_ground_truth()
+        tuple_errors_dictionary = d.get_ground_truth_error_index().row_errors(d.sampled_tuple)
         for j in range(d.dataframe.shape[1]):
             cell = (d.sampled_tuple, j)
-            user_label = int(cell in actual_errors_dictionary)
+            user_label = int(j in tuple_errors_dictionary)
             if random.random() > self.USER_LABELING_ACCURACY:
                 user_label = 1 - user_label
             d.labeled_cells[cell] = [user_label, d.clean_dataframe.iloc[cell]]
@@ -308,65 +605,161 @@ class Detection:
         """
         This method propagates labels.
         """
-        d.extended_labeled_cells = {cell: d.labeled_cells[cell][0] for cell in d.labeled_cells}
         k = len(d.labeled_tuples) + 2 - 1
         for j in range(d.dataframe.shape[1]):
             cell = (d.sampled_tuple, j)
-            if cell in d.cells_clusters_k_j_ce[k][j]:
-                c = d.cells_clusters_k_j_ce[k][j][cell]
+            clustering = d.clusterings_k_j[k][j]
+            if len(clustering) > 0:
+                c = clustering.labels[d.sampled_tuple]
                 d.labels_per_cluster[(j, c)][cell] = d.labeled_cells[cell][0]
+        if self.INCREMENTAL_LABEL_PROPAGATION:
+            self._propagate_labels_incrementally(d, k)
+            if self.VERBOSE:
+                print("The number of labeled data cells increased from {} to {}.".format(len(d.labeled_cells), len(d.extended_labeled_cells)))
+            return
+        d.extended_labeled_cells = {cell: d.labeled_cells[cell][0] for cell in d.labeled_cells}
+        d.extended_labels_j = None
         if self.CLUSTERING_BASED_SAMPLING:
-            for j in d.clusters_k_j_c_ce[k]:
-                for c in d.clusters_k_j_c_ce[k][j]:
+            for j in d.clusterings_k_j[k]:
+                clustering = d.clusterings_k_j[k][j]
+                for c in range(len(clustering)):
                     if len(d.labels_per_cluster[(j, c)]) > 0:
                         if self.LABEL_PROPAGATION_METHOD == "homogeneity":
                             cluster_label = list(d.labels_per_cluster[(j, c)].values())[0]
                             if sum(d.labels_per_cluster[(j, c)].values()) in [0, len(d.labels_per_cluster[(j, c)])]:
-                                for cell in d.clusters_k_j_c_ce[k][j][c]:
-                                    d.extended_labeled_cells[cell] = cluster_label
+                                for i in clustering.rows(c).tolist():
+                                    d.extended_labeled_cells[(i, j)] = cluster_label
                         elif self.LABEL_PROPAGATION_METHOD == "majority":
                             cluster_label = round(
                                 sum(d.labels_per_cluster[(j, c)].values()) / len(d.labels_per_cluster[(j, c)]))
-                            for cell in d.clusters_k_j_c_ce[k][j][c]:
-                                d.extended_labeled_cells[cell] = cluster_label
+                            for i in clustering.rows(c).tolist():
+                                d.extended_labeled_cells[(i, j)] = cluster_label
         if self.VERBOSE:
             print("The number of labeled data cells increased from {} to {}.".format(len(d.labeled_cells), len(d.extended_labeled_cells)))
 
+    def _propagate_labels_incrementally(self, d, k):
+        """
+        This method propagates labels like propagate_labels, but counts the labels per cluster with array operations and
+        keeps the extended label of every data cell as an array, so that only the data cells whose extended label changed
+        are updated in the dictionary of extended labeled cells.
+        """
+        if getattr(d, "extended_labels_j", None) is None or not hasattr(d, "extended_labeled_cells"):
+            d.extended_labeled_cells = {}
+            d.extended_labels_j = {j: numpy.full(d.dataframe.shape[0], -1, dtype=numpy.int8)
+                                   for j in range(d.dataframe.shape[1])}
+        labeled_rows = numpy.array(list(d.labeled_tuples), dtype=int)
+        for j in range(d.dataframe.shape[1]):
+            clustering = d.clusterings_k_j[k][j]
+            row_labels = numpy.full(d.dataframe.shape[0], -1, dtype=numpy.int8)
+            row_labels[labeled_rows] = [d.labeled_cells[(i, j)][0] for i in labeled_rows.tolist()]
+            if self.CLUSTERING_BASED_SAMPLING and len(clustering) > 0:
+                labeled_row_clusters = clustering.labels[labeled_rows]
+                sums = numpy.bincount(labeled_row_clusters, weights=row_labels[labeled_rows],
+                                      minlength=len(clustering)).astype(int)
+                counts = numpy.bincount(labeled_row_clusters, minlength=len(clustering))
+                cluster_labels = numpy.full(len(clustering), -1, dtype=numpy.int8)
+                if self.LABEL_PROPAGATION_METHOD == "homogeneity":
+                    cluster_labels[(counts > 0) & (sums == 0)] = 0
+                    cluster_labels[(counts > 0) & (sums == counts)] = 1
+                elif self.LABEL_PROPAGATION_METHOD == "majority":
+                    labeled_clusters = counts > 0
+                    cluster_labels[labeled_clusters] = numpy.round(sums[labeled_clusters] / counts[labeled_clusters])
+                propagated_labels = cluster_labels[clustering.labels]
+                row_labels = numpy.where(propagated_labels >= 0, propagated_labels, row_labels)
+            for i in numpy.flatnonzero(row_labels != d.extended_labels_j[j]).tolist():
+                if row_labels[i] >= 0:
+                    d.extended_labeled_cells[(i, j)] = int(row_labels[i])
+                else:
+                    del d.extended_labeled_cells[(i, j)]
+            d.extended_labels_j[j] = row_labels
+
+    def _classification_model(self):
+        """
+        This method returns an untrained classification model of the configured type.
+        """
+        if self.CLASSIFICATION_MODEL == "ABC":
+            classification_model = sklearn.ensemble.AdaBoostClassifier(n_estimators=100)
+        if self.CLASSIFICATION_MODEL == "DTC":
+            classification_model = sklearn.tree.DecisionTreeClassifier(criterion="gini")
+        if self.CLASSIFICATION_MODEL == "GBC":
+            classification_model = sklearn.ensemble.GradientBoostingClassifier(n_estimators=100)
+        if self.CLASSIFICATION_MODEL == "GNB":
+            classification_model = sklearn.naive_bayes.GaussianNB()
+        if self.CLASSIFICATION_MODEL == "KNC":
+            classification_model = sklearn.neighbors.KNeighborsClassifier(n_neighbors=1)
+        if self.CLASSIFICATION_MODEL == "SGDC":
+            classification_model = sklearn.linear_model.SGDClassifier(loss="hinge", penalty="l2")
+        if self.CLASSIFICATION_MODEL == "SVC":
+            classification_model = sklearn.svm.SVC(kernel="sigmoid")
+        return classification_model
+
+    def _classification_random_state(self, j):
+        """
+        This method returns the random state of the classification model of column j, derived from the classification
+        seed and the column alone, so that it neither depends on the pool nor draws from the global random state.
+        """
+        return int(numpy.random.SeedSequence([self.CLASSIFICATION_SEED, j]).generate_state(1)[0])
+
+    @staticmethod
+    def _classifier_runner_process(args):
+        """
+        This method trains the classification model of one column and predicts the labels of all its data cells.
+        """
+        classification_model, x_train, y_train, x_test = args
+        classification_model.fit(x_train, y_train)
+        return classification_model.predict(x_test)
+
     def predict_labels(self, d):
         """
         This method predicts the label of data cells.
         """
-        detected_cells_dictionary = {}
+        labeled_cells = numpy.array(list(d.extended_labeled_cells.keys()), dtype=int).reshape(-1, 2)
+        cell_labels = numpy.array(list(d.extended_labeled_cells.values()), dtype=int)
+        labeled_rows = numpy.zeros(d.dataframe.shape[0], dtype=bool)
+        labeled_rows[list(d.labeled_tuples)] = True
+        column_labels_list = []
+        predicted_labels_list = [None] * d.dataframe.shape[1]
+        classification_tasks = []
+        randomized_models = False
         for j in range(d.dataframe.shape[1]):
             feature_vectors = d.column_features[j]
-            x_train = [feature_vectors[i, :] for i in range(d.dataframe.shape[0]) if (i, j) in d.extended_labeled_cells]
-            y_train = [d.extended_labeled_cells[(i, j)] for i in range(d.dataframe.shape[0]) if
-                       (i, j) in d.extended_labeled_cells]
+            column_mask = labeled_cells[:, 1] == j
+            column_labels = numpy.full(d.dataframe.shape[0], -1)
+            column_labels[labeled_cells[column_mask, 0]] = cell_labels[column_mask]
+            column_labels_list.append(column_labels)
+            train_rows = numpy.flatnonzero(column_labels >= 0)
+            x_train = feature_vectors[train_rows]
+            y_train = column_labels[train_rows].tolist()
             x_test = feature_vectors
+            if self.CLASSIFICATION_MODEL == "GNB":
+                x_train, x_test = x_train.toarray(), x_test.toarray()
             if sum(y_train) == len(y_train):
-                predicted_labels = numpy.ones(d.dataframe.shape[0])
-            elif sum(y_train) == 0 or len(x_train[0]) == 0:
-                predicted_labels = numpy.zeros(d.dataframe.shape[0])
+                predicted_labels_list[j] = numpy.ones(d.dataframe.shape[0])
+            elif sum(y_train) == 0 or feature_vectors.shape[1] == 0:
+                predicted_labels_list[j] = numpy.zeros(d.dataframe.shape[0])
             else:
-                if self.CLASSIFICATION_MODEL == "ABC":
-                    classification_model = sklearn.ensemble.AdaBoostClassifier(n_estimators=100)
-                if self.CLASSIFICATION_MODEL == "DTC":
-                    classification_model = sklearn.tree.DecisionTreeClassifier(criterion="gini")
-                if self.CLASSIFICATION_MODEL == "GBC":
-                    classification_model = sklearn.ensemble.GradientBoostingClassifier(n_estimators=100)
-                if self.CLASSIFICATION_MODEL == "GNB":
-                    classification_model = sklearn.naive_bayes.GaussianNB()
-                if self.CLASSIFICATION_MODEL == "KNC":
-                    classification_model = sklearn.neighbors.KNeighborsClassifier(n_neighbors=1)
-                if self.CLASSIFICATION_MODEL == "SGDC":
-                    classification_model = sklearn.linear_model.SGDClassifier(loss="hinge", penalty="l2")
-                if self.CLASSIFICATION_MODEL == "SVC":
-                    classification_model = sklearn.svm.SVC(kernel="sigmoid")
-                classification_model.fit(x_train, y_train)
-                predicted_labels = classification_model.predict(x_test)
-            for i, pl in enumerate(predicted_labels):
-                if (i in d.labeled_tuples and d.extended_labeled_cells[(i, j)]) or (i not in d.labeled_tuples and pl):
-                    detected_cells_dictionary[(i, j)] = "JUST A DUMMY VALUE"
+                classification_model = self._classification_model()
+                if "random_state" in classification_model.get_params():
+                    if self.CLASSIFICATION_SEED is not None:
+                        classification_model.set_params(random_state=self._classification_random_state(j))
+                    else:
+                        randomized_models = True
+                classification_tasks.append([j, [classification_model, x_train, y_train, x_test]])
+        # Unseeded randomized models draw from the global random state, so they are trained in column order in-process.
+        if self.NUM_WORKERS > 1 and len(classification_tasks) > 1 and not randomized_models:
+            pool_executor = ThreadPoolExecutor if self.CLASSIFICATION_POOL == "thread" else ProcessPoolExecutor
+            with pool_executor(max_workers=self.NUM_WORKERS) as executor:
+                predictions = list(executor.map(self._classifier_runner_process, [t[1] for t in classification_tasks]))
+        else:
+            predictions = [self._classifier_runner_process(t[1]) for t in classification_tasks]
+        for (j, _), predicted_labels in zip(classification_tasks, predictions):
+            predicted_labels_list[j] = predicted_labels
+        detected_cells_dictionary = {}
+        for j in range(d.dataframe.shape[1]):
+            detected_rows = numpy.where(labeled_rows, column_labels_list[j] > 0,
+                                        numpy.asarray(predicted_labels_list[j]) != 0)
+            for i in numpy.flatnonzero(detected_rows).tolist():
+                detected_cells_dictionary[(i, j)] = "JUST A DUMMY VALUE"
             if self.VERBOSE:
                 print("A classifier is trained and applied on column {}.".format(j))
         d.detected_cells.update(detected_cells_dictionary)
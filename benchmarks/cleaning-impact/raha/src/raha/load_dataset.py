@@ -1,8 +1,89 @@
 import json
 from pathlib import Path
-from typing import Union, Dict, Tuple
+from typing import Union, Dict, Tuple, Optional, Iterable, List
+import numpy as np
 import pandas as pd
 
+
+class ErrorIndex:
+    """
+    Array-backed index over the cells in which two dataframes differ. Errors are kept sorted by row with offsets into
+    the arrays, plus a column-sorted copy, so both per-row and per-column lookups avoid scanning the whole table.
+    """
+
+    def __init__(self, rows: np.ndarray, cols: np.ndarray, values: np.ndarray, shape: Tuple[int, int]):
+        """
+        @param rows: row indices of the error cells, in ascending order.
+        @param cols: column indices of the error cells.
+        @param values: the value resolved for each error cell.
+        @param shape: shape of the compared dataframes.
+        """
+        self.rows = rows
+        self.cols = cols
+        self.values = values
+        self.shape = shape
+        self.row_offsets = np.searchsorted(rows, np.arange(shape[0] + 1))
+
+        column_order = np.argsort(cols, kind="stable")
+        self.column_rows = rows[column_order]
+        self.column_values = values[column_order]
+        self.column_offsets = np.searchsorted(cols[column_order], np.arange(shape[1] + 1))
+        self._dictionary = None
+        self._cell_keys = None
+        self._cell_keys_order = None
+
+    @classmethod
+    def from_dataframes(cls, df_1: pd.DataFrame, df_2: pd.DataFrame) -> "ErrorIndex":
+        """
+        Builds the index of cells in which df_1 and df_2 differ, resolving each cell to its value in df_1.
+        """
+        rows, cols, values = Dataset.get_dataframes_difference_arrays(df_1, df_2)
+        return cls(rows, cols, values, df_1.shape)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, cell) -> bool:
+        return cell in self.dictionary
+
+    @property
+    def dictionary(self) -> Dict[Tuple[int, int], str]:
+        """
+        The index as a dictionary of cell coordinates to values. It is built once and shared, so do not modify it.
+        """
+        if self._dictionary is None:
+            self._dictionary = dict(zip(zip(self.rows.tolist(), self.cols.tolist()), self.values.tolist()))
+        return self._dictionary
+
+    def locate(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """
+        Returns the position in the index arrays of every given cell, or -1 for cells that are not errors.
+        """
+        if self._cell_keys is None:
+            cell_keys = self.rows.astype(np.int64) * self.shape[1] + self.cols
+            self._cell_keys_order = np.argsort(cell_keys, kind="stable")
+            self._cell_keys = cell_keys[self._cell_keys_order]
+        keys = np.asarray(rows, dtype=np.int64) * self.shape[1] + np.asarray(cols, dtype=np.int64)
+        if len(self._cell_keys) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        found = np.minimum(np.searchsorted(self._cell_keys, keys), len(self._cell_keys) - 1)
+        return np.where(self._cell_keys[found] == keys, self._cell_keys_order[found], -1)
+
+    def row_errors(self, row: int) -> Dict[int, str]:
+        """
+        Returns a dictionary that resolves the column index of every error cell in the given row to its value.
+        """
+        start, end = self.row_offsets[row], self.row_offsets[row + 1]
+        return dict(zip(self.cols[start:end].tolist(), self.values[start:end].tolist()))
+
+    def column_errors(self, column: int) -> Dict[int, str]:
+        """
+        Returns a dictionary that resolves the row index of every error cell in the given column to its value.
+        """
+        start, end = self.column_offsets[column], self.column_offsets[column + 1]
+        return dict(zip(self.column_rows[start:end].tolist(), self.column_values[start:end].tolist()))
+
+
 class Dataset:
     """
     The dataset class.
@@ -19,6 +100,7 @@ class Dataset:
         @param version: version of the generated dataset.
         """
         self.repaired_dataframe = None  # to be assigned after cleaning suggestions were applied.
+        self._ground_truth_index = None  # built lazily, see get_ground_truth_error_index()
         self.version = version
         self.scenario = scenario
         self.raha_result_path = raha_result_path
@@ -35,6 +117,40 @@ class Dataset:
         self.dataframe = self.read_csv_dataset(self.path)
         self.clean_dataframe = self.read_csv_dataset(self.clean_path)
 
+    @property
+    def dataframe(self) -> pd.DataFrame:
+        return self._dataframe
+
+    @dataframe.setter
+    def dataframe(self, dataframe: pd.DataFrame):
+        self._dataframe = dataframe
+        self.invalidate_ground_truth_index()
+
+    @property
+    def clean_dataframe(self) -> pd.DataFrame:
+        return self._clean_dataframe
+
+    @clean_dataframe.setter
+    def clean_dataframe(self, dataframe: pd.DataFrame):
+        self._clean_dataframe = dataframe
+        self.invalidate_ground_truth_index()
+
+    def invalidate_ground_truth_index(self):
+        """
+        Drops the cached ground truth error index. Assigning dataframe or clean_dataframe does this automatically;
+        call it yourself after modifying one of them in place.
+        """
+        self._ground_truth_index = None
+
+    def get_ground_truth_error_index(self) -> ErrorIndex:
+        """
+        Returns the index of all error cells, resolved to their ground truth values. The index is computed on first
+        use and cached until the dirty or the clean dataframe changes.
+        """
+        if getattr(self, "_ground_truth_index", None) is None:
+            self._ground_truth_index = ErrorIndex.from_dataframes(self.clean_dataframe, self.dataframe)
+        return self._ground_truth_index
+
     @staticmethod
     def read_parquet_dataset(dataset_path: Union[str, None]):
         """
@@ -62,24 +178,28 @@ class Dataset:
         dataframe.to_csv(dataset_path, sep=",", header=True, index=False, encoding="utf-8")
 
     @staticmethod
-    def get_dataframes_difference(df_1: pd.DataFrame, df_2: pd.DataFrame) -> Dict:
+    def get_dataframes_difference_arrays(df_1: pd.DataFrame, df_2: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
         """
-        This method compares two dataframes df_1 and df_2. It returns a dictionary whose keys are the coordinates of
-        a cell. The corresponding value is the value in df_1 at the cell's position if the values of df_1 and df_2 are
-        not the same at the given position.
+        This method compares two dataframes df_1 and df_2 positionally. It returns the row indices, the column indices
+        and the df_1 values of all cells whose values differ, ordered row by row.
         """
         if df_1.shape != df_2.shape:
             raise ValueError("Two compared datasets do not have equal sizes.")
 
-        diff_mask = df_1 != df_2
-
-        differences = {}
-        for row_idx, row in enumerate(diff_mask.index):
-            for col_idx, column in enumerate(diff_mask.columns):
-                if diff_mask.at[row, column]:
-                    differences[(row_idx, col_idx)] = df_1.at[row, column]
+        values_1 = df_1.to_numpy()
+        diff_mask = values_1 != df_2.to_numpy()
+        rows, cols = np.nonzero(diff_mask)
+        return rows, cols, values_1[rows, cols]
 
-        return differences
+    @staticmethod
+    def get_dataframes_difference(df_1: pd.DataFrame, df_2: pd.DataFrame) -> Dict:
+        """
+        This method compares two dataframes df_1 and df_2. It returns a dictionary whose keys are the coordinates of
+        a cell. The corresponding value is the value in df_1 at the cell's position if the values of df_1 and df_2 are
+        not the same at the given position.
+        """
+        rows, cols, values = Dataset.get_dataframes_difference_arrays(df_1, df_2)
+        return dict(zip(zip(rows.tolist(), cols.tolist()), values.tolist()))
 
     def create_repaired_dataset(self, correction_dictionary):
         """
@@ -99,7 +219,7 @@ class Dataset:
         """
         Returns a dictionary that resolves every error cell to the ground truth.
         """
-        return self.get_dataframes_difference(self.clean_dataframe, self.dataframe)
+        return dict(self.get_ground_truth_error_index().dictionary)
 
     def get_errors_dictionary(self, mode: 'str') -> Dict[Tuple[int, int], str]:
         """
@@ -110,7 +230,9 @@ class Dataset:
         error positions that we detected with raha.
         """
         if mode == 'perfect':
-            return self.get_dataframes_difference(self.dataframe, self.clean_dataframe)
+            error_index = self.get_ground_truth_error_index()
+            dirty_values = self.dataframe.to_numpy()[error_index.rows, error_index.cols]
+            return dict(zip(zip(error_index.rows.tolist(), error_index.cols.tolist()), dirty_values.tolist()))
         if mode == 'raha':
             raha_results = []
             for file_path in Path(self.raha_result_path).glob('*.json'):
@@ -139,32 +261,92 @@ class Dataset:
         """
         This method calculates data quality of a dataset.
         """
-        return 1.0 - float(len(self._get_actual_errors_dictionary_ground_truth())) / (self.dataframe.shape[0] * self.dataframe.shape[1])
+        return 1.0 - float(len(self.get_ground_truth_error_index())) / (self.dataframe.shape[0] * self.dataframe.shape[1])
 
-    def get_data_cleaning_evaluation(self, correction_dictionary, sampled_rows_dictionary=False):
+    @staticmethod
+    def _cleaning_scores(output_size: float, ed_tp: float, ec_tp: float, errors_count: float) -> List[float]:
         """
-        This method evaluates data cleaning process.
+        Returns the precision, recall and F1 of error detection and error correction from the counts of one evaluation.
         """
-        actual_errors = self._get_actual_errors_dictionary_ground_truth()
-        if sampled_rows_dictionary:
-            actual_errors = {(i, j): actual_errors[(i, j)] for (i, j) in actual_errors if i in sampled_rows_dictionary}
-        ed_tp = 0.0
-        ec_tp = 0.0
-        output_size = 0.0
-        for cell in correction_dictionary:
-            if (not sampled_rows_dictionary) or (cell[0] in sampled_rows_dictionary):
-                output_size += 1
-                if cell in actual_errors:
-                    ed_tp += 1.0
-                    if correction_dictionary[cell] == actual_errors[cell]:
-                        ec_tp += 1.0
         ed_p = 0.0 if output_size == 0 else ed_tp / output_size
-        ed_r = 0.0 if len(actual_errors) == 0 else ed_tp / len(actual_errors)
+        ed_r = 0.0 if errors_count == 0 else ed_tp / errors_count
         ed_f = 0.0 if (ed_p + ed_r) == 0.0 else (2 * ed_p * ed_r) / (ed_p + ed_r)
         ec_p = 0.0 if output_size == 0 else ec_tp / output_size
-        ec_r = 0.0 if len(actual_errors) == 0 else ec_tp / len(actual_errors)
+        ec_r = 0.0 if errors_count == 0 else ec_tp / errors_count
         ec_f = 0.0 if (ec_p + ec_r) == 0.0 else (2 * ec_p * ec_r) / (ec_p + ec_r)
         return [ed_p, ed_r, ed_f, ec_p, ec_r, ec_f]
+
+    def evaluate_data_cleaning_arrays(self,
+                                      rows: np.ndarray,
+                                      cols: np.ndarray,
+                                      values: Optional[np.ndarray] = None,
+                                      sampled_rows: Optional[Iterable[int]] = None,
+                                      per_column: bool = False,
+                                      error_types: Optional[Dict[Tuple[int, int], str]] = None) -> Dict:
+        """
+        Evaluates the output of a data cleaning run given as arrays, by joining it against the ground truth error index.
+
+        @param rows: row indices of the outputted cells, each cell at most once.
+        @param cols: column indices of the outputted cells.
+        @param values: the corrected value of each outputted cell. Without values, no cell counts as corrected.
+        @param sampled_rows: if given, only these rows are evaluated.
+        @param per_column: whether to add the scores of every column.
+        @param error_types: if given, a dictionary that resolves error cells to their error type. The recall of error
+        detection and error correction is then added for every error type, with error cells missing from the
+        dictionary grouped under the empty type.
+        @return: a dictionary with the [ed_p, ed_r, ed_f, ec_p, ec_r, ec_f] scores under "total", the same scores per
+        column index under "columns", and [ed_r, ec_r] per error type under "error_types".
+        """
+        error_index = self.get_ground_truth_error_index()
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        error_cells = np.ones(len(error_index), dtype=bool)
+        if sampled_rows is not None:
+            sampled_rows_mask = np.zeros(self.dataframe.shape[0], dtype=bool)
+            sampled_rows_mask[np.asarray(list(sampled_rows), dtype=np.int64)] = True
+            outputted_cells = sampled_rows_mask[rows]
+            rows, cols = rows[outputted_cells], cols[outputted_cells]
+            if values is not None:
+                values = np.asarray(values, dtype=object)[outputted_cells]
+            error_cells = sampled_rows_mask[error_index.rows]
+        positions = error_index.locate(rows, cols)
+        detected = positions >= 0
+        corrected = np.zeros(len(rows), dtype=bool)
+        if values is not None:
+            values = np.asarray(values, dtype=object)
+            corrected[detected] = values[detected] == error_index.values[positions[detected]]
+        evaluation = {"total": self._cleaning_scores(float(len(rows)), float(detected.sum()), float(corrected.sum()),
+                                                     float(error_cells.sum()))}
+        if per_column:
+            columns_count = self.dataframe.shape[1]
+            output_sizes = np.bincount(cols, minlength=columns_count)
+            ed_tps = np.bincount(cols[detected], minlength=columns_count)
+            ec_tps = np.bincount(cols[corrected], minlength=columns_count)
+            errors_counts = np.bincount(error_index.cols[error_cells], minlength=columns_count)
+            evaluation["columns"] = {j: self._cleaning_scores(float(output_sizes[j]), float(ed_tps[j]),
+                                                              float(ec_tps[j]), float(errors_counts[j]))
+                                     for j in range(columns_count)}
+        if error_types is not None:
+            type_names, type_ids = np.unique(np.array(
+                [error_types.get(cell, "") for cell in zip(error_index.rows.tolist(), error_index.cols.tolist())],
+                dtype=object).astype(str), return_inverse=True)
+            ed_tps = np.bincount(type_ids[positions[detected]], minlength=len(type_names))
+            ec_tps = np.bincount(type_ids[positions[corrected]], minlength=len(type_names))
+            errors_counts = np.bincount(type_ids[error_cells], minlength=len(type_names))
+            evaluation["error_types"] = {
+                type_name: [float(ed_tps[t]) / errors_counts[t], float(ec_tps[t]) / errors_counts[t]]
+                for t, type_name in enumerate(type_names.tolist()) if errors_counts[t] > 0}
+        return evaluation
+
+    def get_data_cleaning_evaluation(self, correction_dictionary, sampled_rows_dictionary=False):
+        """
+        This method evaluates data cleaning process.
+        """
+        cells = np.array(list(correction_dictionary.keys()), dtype=np.int64).reshape(-1, 2)
+        values = np.empty(len(correction_dictionary), dtype=object)
+        values[:] = list(correction_dictionary.values())
+        sampled_rows = list(sampled_rows_dictionary) if sampled_rows_dictionary else None
+        return self.evaluate_data_cleaning_arrays(cells[:, 0], cells[:, 1], values, sampled_rows)["total"]
 ########################################
 
 
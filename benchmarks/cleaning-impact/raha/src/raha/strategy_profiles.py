@@ -0,0 +1,208 @@
+import os
+import json
+import fcntl
+import pickle
+import hashlib
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class StrategyProfileStore:
+    """
+    Columnar store of the strategy profiles of one dataset. The detected cells of all strategies are appended to one
+    binary file of int32 (row, column) pairs, which is read memory-mapped, and every strategy gets one JSON line in an
+    index file with its name, runtime and slice of the cells file. Folders written by older versions, with one pickled
+    profile per strategy, are still read.
+    """
+
+    CELLS_FILE = "cells.int32"
+    INDEX_FILE = "profiles.jsonl"
+    LEGACY_SUFFIX = ".dictionary"
+    CELL_SIZE = 2 * np.dtype(np.int32).itemsize
+
+    def __init__(self, folder_path: str):
+        """
+        @param folder_path: the strategy-profiling folder of the dataset.
+        """
+        self.folder_path = folder_path
+        self.cells_path = os.path.join(folder_path, self.CELLS_FILE)
+        self.index_path = os.path.join(folder_path, self.INDEX_FILE)
+
+    def is_legacy(self) -> bool:
+        """
+        Whether the folder only holds pickled strategy profiles.
+        """
+        return not os.path.exists(self.index_path) and any(
+            file_name.endswith(self.LEGACY_SUFFIX) for file_name in os.listdir(self.folder_path))
+
+    def append(self, strategy_profiles: Iterable[Dict]) -> None:
+        """
+        Appends strategy profiles to the store. The cells are written before the index lines that point to them, so an
+        interrupted append never leaves the index pointing past the end of the cells file. Whatever an interrupted
+        append left behind, a partial index line or cells past the last indexed profile, is truncated before the new
+        profiles are written. Appends of several processes to the same store are serialized with an exclusive lock on
+        the cells file.
+        """
+        strategy_profiles = list(strategy_profiles)
+        if not strategy_profiles:
+            return
+        with open(self.cells_path, "ab") as cells_file, open(self.index_path, "a+b") as index_file:
+            fcntl.flock(cells_file, fcntl.LOCK_EX)
+            try:
+                offset = self._truncate_interrupted_append(cells_file, index_file)
+                index_lines = []
+                cells_list = []
+                for strategy_profile in strategy_profiles:
+                    cells = np.array(strategy_profile["output"], dtype=np.int32).reshape(-1, 2)
+                    cells_list.append(cells)
+                    index_lines.append(json.dumps({"name": strategy_profile["name"],
+                                                   "runtime": strategy_profile["runtime"],
+                                                   "offset": offset, "count": len(cells)}) + "\n")
+                    offset += len(cells)
+                cells_file.write(np.concatenate(cells_list).tobytes())
+                cells_file.flush()
+                index_file.write("".join(index_lines).encode("utf-8"))
+            finally:
+                fcntl.flock(cells_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _line_start(index_file, end: int) -> int:
+        """
+        Returns the position right after the last newline before position end of the index file, or 0 if there is none.
+        """
+        position = end
+        while position > 0:
+            start = max(position - 4096, 0)
+            index_file.seek(start)
+            newline = index_file.read(position - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            position = start
+        return 0
+
+    def _truncate_interrupted_append(self, cells_file, index_file) -> int:
+        """
+        Truncates the index file after its last newline and the cells file after the cells of the last indexed profile,
+        so that the next append neither gets glued to a partial index line nor lands after a torn cells write. Returns
+        the number of stored cells.
+        """
+        end = index_file.seek(0, os.SEEK_END)
+        index_end = self._line_start(index_file, end)
+        if index_end < end:
+            index_file.truncate(index_end)
+        cells_count = 0
+        if index_end > 0:
+            last_line_start = self._line_start(index_file, index_end - 1)
+            index_file.seek(last_line_start)
+            last_entry = json.loads(index_file.read(index_end - last_line_start))
+            cells_count = last_entry["offset"] + last_entry["count"]
+        cells_end = cells_count * self.CELL_SIZE
+        if os.fstat(cells_file.fileno()).st_size > cells_end:
+            cells_file.truncate(cells_end)
+        return cells_count
+
+    def cells(self) -> np.ndarray:
+        """
+        Returns a read-only memory map of all the stored cells as an array of shape (cells count, 2). A torn cells pair at
+        the end of the file, being written or left by an interrupted append, is left out.
+        """
+        cells_count = os.path.getsize(self.cells_path) // self.CELL_SIZE if os.path.exists(self.cells_path) else 0
+        if cells_count == 0:
+            return np.zeros((0, 2), dtype=np.int32)
+        return np.memmap(self.cells_path, dtype=np.int32, mode="r", shape=(cells_count, 2))
+
+    def entries(self) -> Iterator[Dict]:
+        """
+        Yields the index entries of the stored strategy profiles, skipping a last line that is still being written.
+        """
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path) as index_file:
+            for line in index_file:
+                if line.endswith("\n"):
+                    yield json.loads(line)
+
+    @staticmethod
+    def output(entry: Dict, cells: np.ndarray) -> List[Tuple[int, int]]:
+        """
+        Returns the detected cells of an index entry as a list of (row, column) tuples.
+        """
+        return [tuple(cell) for cell in cells[entry["offset"]:entry["offset"] + entry["count"]].tolist()]
+
+    def __iter__(self) -> Iterator[Dict]:
+        """
+        Yields the stored strategy profiles, with their outputs as lists of (row, column) tuples, in order of append.
+        """
+        if self.is_legacy():
+            for file_name in os.listdir(self.folder_path):
+                if file_name.endswith(self.LEGACY_SUFFIX):
+                    with open(os.path.join(self.folder_path, file_name), "rb") as strategy_file:
+                        yield pickle.load(strategy_file)
+            return
+        cells = self.cells()
+        for entry in self.entries():
+            yield {"name": entry["name"], "output": self.output(entry, cells), "runtime": entry["runtime"]}
+
+    def load(self) -> List[Dict]:
+        """
+        Returns all the stored strategy profiles.
+        """
+        return list(self)
+
+
+class StrategyOutputCache:
+    """
+    Content-addressed cache of strategy outputs, shared by all the scenarios and versions of a dataset. Every output is
+    stored under a hash of the strategy and the contents of the columns it reads, so a strategy is only rerun when one
+    of these columns changed. The cache is a StrategyProfileStore whose profile names are these hashes.
+    """
+
+    def __init__(self, folder_path: str):
+        """
+        @param folder_path: the folder of the cache, created if needed.
+        """
+        os.makedirs(folder_path, exist_ok=True)
+        self.store = StrategyProfileStore(folder_path)
+        self.entries = {entry["name"]: entry for entry in self.store.entries()}
+        self.cells = self.store.cells()
+
+    @staticmethod
+    def column_hashes(dataframe: pd.DataFrame) -> Dict[str, str]:
+        """
+        Returns the hash of every column of the dataframe, covering its position, name and values.
+        """
+        return {attribute: hashlib.sha1(json.dumps([j, attribute, dataframe[attribute].tolist()]).encode("utf-8"))
+                .hexdigest() for j, attribute in enumerate(dataframe.columns.tolist())}
+
+    @staticmethod
+    def file_hash(file_path: str) -> str:
+        """
+        Returns the hash of the contents of a file, such as a knowledge base a strategy reads.
+        """
+        with open(file_path, "rb") as input_file:
+            return hashlib.sha1(input_file.read()).hexdigest()
+
+    @staticmethod
+    def key(algorithm: str, configuration, column_hashes: Sequence[str]) -> str:
+        """
+        Returns the cache key of a strategy given the hashes of the columns it reads.
+        """
+        return hashlib.sha1(json.dumps([algorithm, configuration, list(column_hashes)]).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Returns the cached output and runtime of a strategy, or None if it is not cached.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        return {"output": StrategyProfileStore.output(entry, self.cells), "runtime": entry["runtime"]}
+
+    def put(self, keyed_strategy_profiles: Iterable[Tuple[str, Dict]]) -> None:
+        """
+        Appends the outputs of strategy profiles to the cache under the given keys.
+        """
+        self.store.append({"name": key, "output": strategy_profile["output"], "runtime": strategy_profile["runtime"]}
+                          for key, strategy_profile in keyed_strategy_profiles)
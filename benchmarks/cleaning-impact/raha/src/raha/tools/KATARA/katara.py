@@ -1,4 +1,12 @@
+import os
+import itertools
 
+import numpy
+import pandas
+
+
+# Parsed knowledge bases of this process, by file path: (modification time, knowledge base).
+knowledge_bases = {}
 
 def load_file(domin_specific_file, domain_specific_types, rel2sub2obj):
     for line in domin_specific_file:
@@ -18,75 +26,90 @@ def load_file(domin_specific_file, domain_specific_types, rel2sub2obj):
             rel2sub2obj[rel] = {s: o}
 
 
-def domain_spec_col_type(data, col, domain_specific_types, col_2_errors_repair, type_coverage, ignore_null):
-    values = [row[col] for row in data]
+def load_knowledge_base(domin_specific_file_path):
+    # Knowledge bases are parsed once per process and reused by every strategy, until the file changes.
+    modification_time = os.path.getmtime(domin_specific_file_path)
+    cached = knowledge_bases.get(domin_specific_file_path)
+    if cached is not None and cached[0] == modification_time:
+        return cached[1]
+
+    domain_specific_types = set()
+    rel2sub2obj = {}
+    with open(domin_specific_file_path, "r") as domin_specific_file:
+        load_file(domin_specific_file, domain_specific_types, rel2sub2obj)
+
+    knowledge_base = {
+        "lowercase_types": {domain_type.lower() for domain_type in domain_specific_types},
+        "rel2sub2obj": {rel: pandas.Series(sub2obj, dtype=object) for rel, sub2obj in rel2sub2obj.items()}
+    }
+    knowledge_bases[domin_specific_file_path] = (modification_time, knowledge_base)
+    return knowledge_base
 
-    lowercase_types = {domain_type.lower() for domain_type in domain_specific_types}
 
-    count = 0
-    tempdict = {}
-    for index in range(len(data)):
-        value = values[index]
-        if value.lower() in lowercase_types:
-            if ignore_null or value.lower() != '':
-                count += 1
-        else:
-            fix = ""
-            tempdict[(index, col)] = fix
+def cells_dictionary(rows, col, values):
+    return dict(zip(zip(rows.tolist(), itertools.repeat(col)), values))
+
+
+def domain_spec_col_type(dataframe, col, lowercase_types, col_2_errors_repair, type_coverage, ignore_null):
+    values = dataframe.iloc[:, col].str.lower()
+
+    matches = values.isin(lowercase_types).to_numpy()
+    if ignore_null:
+        count = int(matches.sum())
+    else:
+        count = int((matches & (values != '').to_numpy()).sum())
 
     coverage = count/len(values)
 
     if coverage > type_coverage:
-        col_2_errors_repair.update(tempdict)
+        rows = numpy.flatnonzero(~matches)
+        col_2_errors_repair.update(cells_dictionary(rows, col, itertools.repeat("")))
+
+
+def related_objects(dataframe, col, rel, rel2sub2obj, objects):
+    # The object of each value of column col in relation rel (NaN if the value is not a subject), computed once per run.
+    if (col, rel) not in objects:
+        objects[(col, rel)] = dataframe.iloc[:, col].map(rel2sub2obj[rel]).to_numpy()
+    return objects[(col, rel)]
 
 
-def domain_spec_colpair(data, i, j, rel2sub2obj, col_2_errors_repair, pair_coverage, ignore_null):
+def domain_spec_colpair(dataframe, i, j, rel2sub2obj, objects, col_2_errors_repair, pair_coverage, ignore_null):
+    coli = dataframe.iloc[:, i].to_numpy()
+    colj = dataframe.iloc[:, j].to_numpy()
     for rel in rel2sub2obj:
-        count = 0               # counts i to j relation
-        back_count = 0          # counts j to i relation
-        tempdict = {}
-        backdict = {}
-        for index, row in enumerate(data):
-            coli = row[i]
-            colj = row[j]
-            if coli in rel2sub2obj[rel]:
-                if colj == rel2sub2obj[rel][coli]:
-                    if ignore_null or coli != '':
-                        count += 1
-                else:
-                    repair_value = rel2sub2obj[rel][coli]
-                    tempdict[(index, j)] = repair_value
-            if colj in rel2sub2obj[rel]:
-                if coli == rel2sub2obj[rel][colj]:
-                    if ignore_null or colj != '':
-                        back_count += 1
-                else:
-                    repair_value = rel2sub2obj[rel][colj]
-                    backdict[(index, i)] = repair_value
-
-        coverage = count/ len(data)
-        backcoverage = back_count / len(data)
+        objects_i = related_objects(dataframe, i, rel, rel2sub2obj, objects)
+        objects_j = related_objects(dataframe, j, rel, rel2sub2obj, objects)
+        subject_i = pandas.notna(objects_i)
+        subject_j = pandas.notna(objects_j)
+        match_i = subject_i & (objects_i == colj)           # i to j relation
+        match_j = subject_j & (objects_j == coli)           # j to i relation
+        count = int((match_i if ignore_null else match_i & (coli != '')).sum())
+        back_count = int((match_j if ignore_null else match_j & (colj != '')).sum())
+
+        coverage = count/ len(dataframe)
+        backcoverage = back_count / len(dataframe)
 
         if coverage >= pair_coverage:
-            col_2_errors_repair.update(tempdict)         # adds the errors found to the final output
+            rows = numpy.flatnonzero(subject_i & ~match_i)
+            col_2_errors_repair.update(cells_dictionary(rows, j, objects_i[rows]))         # adds the errors found to the final output
         if backcoverage >= pair_coverage:
-            col_2_errors_repair.update(backdict)
+            rows = numpy.flatnonzero(subject_j & ~match_j)
+            col_2_errors_repair.update(cells_dictionary(rows, i, objects_j[rows]))
 
 
 def run(data, domin_specific_file_path, type_coverage=0.2, pair_coverage=0.15, ignore_null=True):
-    data = data.dataframe.to_numpy().tolist()
-    domain_specific_types = set()
-    rel2sub2obj = {}
+    dataframe = data.dataframe
+    knowledge_base = load_knowledge_base(domin_specific_file_path)
     col_2_errors_repair = {}
-    domin_specific_file = open(domin_specific_file_path, "r")
-
-    load_file(domin_specific_file, domain_specific_types, rel2sub2obj)
 
-    for col in range(len(data[0])):
-        domain_spec_col_type(data, col, domain_specific_types, col_2_errors_repair, type_coverage, ignore_null)
+    for col in range(dataframe.shape[1]):
+        domain_spec_col_type(dataframe, col, knowledge_base["lowercase_types"], col_2_errors_repair, type_coverage,
+                             ignore_null)
 
-    for i in range(len(data[0])):
-        for j in range(len(data[0])-1, i, -1):
-            domain_spec_colpair(data, i, j, rel2sub2obj, col_2_errors_repair, pair_coverage, ignore_null)
+    objects = {}
+    for i in range(dataframe.shape[1]):
+        for j in range(dataframe.shape[1]-1, i, -1):
+            domain_spec_colpair(dataframe, i, j, knowledge_base["rel2sub2obj"], objects, col_2_errors_repair,
+                                pair_coverage, ignore_null)
 
     return col_2_errors_repair
@@ -1,6 +1,8 @@
 #! /usr/bin/env python3
 from .utils import tupleops
 from .utils.printing import debug
+from .utils.columns import ExpandedColumns
+from collections import OrderedDict
 from itertools import chain
 import timeit,sys
 
@@ -11,37 +13,121 @@ def expand_field(f, rules):
 def expand(x, rules):
     return tuple(expand_field(f, rules) for f in x)
 
+class ExpansionCache:
+    """Bounded LRU cache of expanded fields for a given set of rules, keyed on
+    the (type, value) of each field, so that repeated values are expanded
+    once."""
+    MAX_SIZE = 2 ** 16
+
+    def __init__(self, rules, max_size = MAX_SIZE):
+        self.rules = rules
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def expand_field(self, f):
+        # float keys use their exact representation, so that 0.0 and -0.0 are not merged
+        key = (type(f), f.hex() if type(f) is float else f)
+        try:
+            expanded = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            expanded = self.entries[key] = expand_field(f, self.rules)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last = False)
+            return expanded
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return expanded
+
+    def expand(self, x):
+        return tuple(self.expand_field(f) for f in x)
+
 def expand_hints(X, hints):
     expanded_hints = tupleops.deepmap(lambda h: X[h[0]][h[1]], hints)
     return (expanded_hints,) + X
 
-def expand_stream(generator, rules, keep_x, hints, maxrecords = float("+inf")):
+def expand_stream(generator, rules, keep_x, hints, maxrecords = float("+inf"), cache = None):
     for idx, x in enumerate(generator()):
         if idx >= maxrecords:
             break
-        X = expand(x, rules)
+        X = expand(x, rules) if cache is None else cache.expand(x)
         if hints is not None:
             X = expand_hints(X, hints)
         yield (x, X) if keep_x else X
 
+def find_discrepancies(model, testset):
+    """Yields (x, X, discrepancies) for each (x, X) of the test set, using the
+    batched find_discrepancies_batch of the model when it has one."""
+    if hasattr(model, "find_discrepancies_batch"):
+        testset = list(testset)
+        batch_discrepancies = model.find_discrepancies_batch([X for _, X in testset])
+        for (x, X), discrepancies in zip(testset, batch_discrepancies):
+            yield x, X, discrepancies
+    else:
+        for index, (x, X) in enumerate(testset):
+            yield x, X, model.find_discrepancies(X, index)
+
 def outliers(trainset_generator, testset_generator, analyzer, model, rules,runtime_progress, maxrecords = float("+inf")):
     start = timeit.default_timer()
+    cache = ExpansionCache(rules)
     debug(">> Finding correlations")
 
-    analyzer.fit(expand_stream(trainset_generator, rules, False, None, maxrecords))
+    analyzer.fit(expand_stream(trainset_generator, rules, False, None, maxrecords, cache))
     # debug(analyzer.hints)
 
     debug(">> Building model...")
     analyzer.expand_stats()
-    model.fit(expand_stream(trainset_generator, rules, False, analyzer.hints, maxrecords), analyzer)
+    model.fit(expand_stream(trainset_generator, rules, False, analyzer.hints, maxrecords, cache), analyzer)
 
     debug(">> Finding outliers...")
-    for index, (x, X) in enumerate(expand_stream(testset_generator, rules,
-                                                 True, analyzer.hints, maxrecords)):
-        discrepancies = model.find_discrepancies(X, index)
+    testset = expand_stream(testset_generator, rules, True, analyzer.hints, maxrecords, cache)
+    for index, (x, X, discrepancies) in enumerate(find_discrepancies(model, testset)):
         if len(discrepancies) > 0:
             yield index, (x, X, discrepancies)
         if index % runtime_progress == 0:
             debug("Time {} {}".format(index,timeit.default_timer()-start))
     stop = timeit.default_timer()
     debug("Runtime ",stop-start)
+    debug("Expansion cache: {} hits, {} misses".format(cache.hits, cache.misses))
+
+def outliers_batch(trainset_generator, testset_generator, analyzer, models, rules, maxrecords = float("+inf")):
+    """Like outliers, but for several models sharing one analyzer. Each tuple is
+    expanded once and buffered column-wise (see ExpandedColumns); the analyzer
+    and every model are then fitted from the buffer and tested against it.
+    Yields (model, outliers) pairs."""
+    start = timeit.default_timer()
+    cache = ExpansionCache(rules)
+    debug(">> Finding correlations")
+
+    trainset = ExpandedColumns(expand_stream(trainset_generator, rules, False, None, maxrecords, cache))
+    if hasattr(analyzer, "fit_columns"):
+        analyzer.fit_columns(trainset)
+    else:
+        analyzer.fit(trainset.rows())
+    analyzer.expand_stats()
+    trainset = trainset.expand_hints(analyzer.hints)
+
+    debug(">> Building models...")
+    for model in models:
+        if hasattr(model, "fit_columns"):
+            model.fit_columns(trainset, analyzer)
+        else:
+            model.fit(trainset.rows(), analyzer)
+
+    debug(">> Finding outliers...")
+    for model in models:
+        if testset_generator is trainset_generator:
+            testset = zip(testset_generator(), trainset.rows())
+        else:
+            testset = expand_stream(testset_generator, rules, True, analyzer.hints, maxrecords, cache)
+
+        model_outliers = []
+        for index, (x, X, discrepancies) in enumerate(find_discrepancies(model, testset)):
+            if len(discrepancies) > 0:
+                model_outliers.append((index, (x, X, discrepancies)))
+        yield model, model_outliers
+    stop = timeit.default_timer()
+    debug("Runtime ",stop-start)
+    debug("Expansion cache: {} hits, {} misses".format(cache.hits, cache.misses))
@@ -19,6 +19,8 @@ Public members:
 
 from numbers import Number
 from math import fabs
+from operator import mul
+import numpy
 from ..utils.tupleops import defaultif_masked, deepapply_masked, pair_ids, make_mask_abc
 from ..analyzers.utils import Stats
 
@@ -52,19 +54,115 @@ class Pearson:
 
     def fit(self, Xs):
         for X in Xs:
-            if self.mask == None:
-                self.mask = make_mask_abc(X, Number)
+            self.fit_one(X)
+        self.finish_fit()
 
-            self.stats = defaultif_masked(self.stats, X, Stats, self.mask)
-            deepapply_masked(self.stats, X, Stats.update, self.mask)
+    def fit_one(self, X):
+        if self.mask == None:
+            self.mask = make_mask_abc(X, Number)
 
-            if self.pairwise_prods == None:
-                self.pairwise_prods = {pid: 0 for pid in pair_ids(X, self.mask)}
+        self.stats = defaultif_masked(self.stats, X, Stats, self.mask)
+        deepapply_masked(self.stats, X, Stats.update, self.mask)
 
-            for (id1, id2) in self.pairwise_prods:
-                (idx, sidx), (idy, sidy) = id1, id2
-                self.pairwise_prods[(id1, id2)] += X[idx][sidx] * X[idy][sidy]
+        if self.pairwise_prods == None:
+            self.pairwise_prods = {pid: 0 for pid in pair_ids(X, self.mask)}
 
+        for (id1, id2) in self.pairwise_prods:
+            (idx, sidx), (idy, sidy) = id1, id2
+            self.pairwise_prods[(id1, id2)] += X[idx][sidx] * X[idy][sidy]
+
+    # Largest integer below which all float64 integer arithmetic is exact
+    EXACT_INT_BOUND = 2 ** 53
+    # Number of float64 products summed at once by fit_columns
+    BLOCK_SIZE = 2 ** 22
+
+    @staticmethod
+    def sequential_sums(matrix):
+        """Sums the columns of a float64 matrix row after row, starting from 0,
+        which rounds every partial sum exactly as the += of fit does."""
+        with numpy.errstate(over = "ignore", invalid = "ignore"):
+            return numpy.cumsum(numpy.vstack((numpy.zeros((1, matrix.shape[1])), matrix)), axis = 0)[-1].tolist()
+
+    def fit_columns(self, columns):
+        """Vectorized fit on an ExpandedColumns buffer.
+
+        Produces the same stats, pearsons and hints as fit. The sums and
+        pairwise products of integer features are all computed in one matrix
+        product, which is exact as long as the sums stay below EXACT_INT_BOUND.
+        The sums of float features, and of their products with float or small
+        integer features, are accumulated in row order with numpy.cumsum, which
+        rounds exactly as fit. Other features (mixed or huge integers) are
+        summed in row order in Python, as fit does."""
+        fields = columns.columns
+        self.mask = tuple(tuple(len(column) > 0 and isinstance(column[0], Number) for column in field)
+                          for field in fields)
+
+        ids, arrays, kinds, bounds = {}, [], [], []
+        for idx, (field, m) in enumerate(zip(fields, self.mask)):
+            for sidx, (column, mi) in enumerate(zip(field, m)):
+                if mi:
+                    array = numpy.array(column)
+                    if array.dtype.kind in "bi":
+                        kind, bound = "i", int(numpy.abs(array.astype(object)).max())
+                    elif array.dtype.kind == "f" and set(map(type, column)) == {float}:
+                        kind, bound = "f", None
+                    else:
+                        continue
+                    ids[(idx, sidx)] = len(arrays)
+                    arrays.append(array.astype(float))
+                    kinds.append(kind)
+                    bounds.append(bound)
+        matrix = numpy.column_stack(arrays) if arrays else numpy.zeros((len(columns), 0))
+        int_features = [i for i, kind in enumerate(kinds) if kind == "i"]
+        float_features = [i for i, kind in enumerate(kinds) if kind == "f"]
+        if int_features:
+            int_prods = dict(zip(((i, j) for i in int_features for j in int_features),
+                                 (matrix[:, int_features].T @ matrix[:, int_features]).ravel().tolist()))
+            int_sums = dict(zip(int_features, matrix[:, int_features].sum(axis = 0).tolist()))
+        if float_features:
+            float_matrix = matrix[:, float_features]
+            float_sums = dict(zip(float_features, Pearson.sequential_sums(float_matrix)))
+            float_sums2 = dict(zip(float_features, Pearson.sequential_sums(float_matrix * float_matrix)))
+
+        def exact_int(i, j):
+            return (kinds[i] == kinds[j] == "i" and
+                    len(columns) * max(bounds[i], 1) * max(bounds[j], 1) < Pearson.EXACT_INT_BOUND)
+
+        def sums(feature_id):
+            i = ids.get(feature_id)
+            if i is not None and kinds[i] == "f":
+                return float_sums[i], float_sums2[i]
+            if i is not None and exact_int(i, i):
+                return int(int_sums[i]), int(int_prods[(i, i)])
+            return None
+
+        self.stats = tuple(tuple(Stats.from_values(column, sums((idx, sidx))) if mi else None
+                                 for sidx, (column, mi) in enumerate(zip(field, m)))
+                           for idx, (field, m) in enumerate(zip(fields, self.mask)))
+
+        self.pairwise_prods, float_pairs = {}, []
+        for pid in pair_ids(fields, self.mask):
+            (idx, sidx), (idy, sidy) = pid
+            i, j = ids.get((idx, sidx)), ids.get((idy, sidy))
+            if i is not None and j is not None and exact_int(i, j):
+                self.pairwise_prods[pid] = int(int_prods[(i, j)])
+            elif (i is not None and j is not None and "f" in (kinds[i], kinds[j]) and
+                  all(kinds[k] == "f" or bounds[k] <= Pearson.EXACT_INT_BOUND for k in (i, j))):
+                self.pairwise_prods[pid] = None
+                float_pairs.append((pid, i, j))
+            else:
+                self.pairwise_prods[pid] = sum(map(mul, fields[idx][sidx], fields[idy][sidy]))
+        block_size = max(1, Pearson.BLOCK_SIZE // max(len(columns), 1))
+        for start in range(0, len(float_pairs), block_size):
+            block = float_pairs[start:start + block_size]
+            with numpy.errstate(over = "ignore", invalid = "ignore"):
+                products = matrix[:, [i for _, i, _ in block]] * matrix[:, [j for _, _, j in block]]
+            for (pid, _, _), prod in zip(block, Pearson.sequential_sums(products)):
+                self.pairwise_prods[pid] = prod
+
+        self.finish_fit()
+
+    def finish_fit(self):
         for pair_id in self.pairwise_prods:
             pearson = self.pearson(pair_id)
             if pearson != None and fabs(pearson) > self.corr_threshold:
@@ -1,6 +1,7 @@
 from math import sqrt
+from operator import mul
 from collections import namedtuple
-from itertools import combinations, product
+from itertools import chain, combinations, product
 
 class Stats:
     MAX_CARDINALITY = 25 
@@ -27,6 +28,21 @@ class Stats:
             if len(self.elems) > Stats.MAX_CARDINALITY:
                 self.elems = None
 
+    @staticmethod
+    def from_values(values, sums = None):
+        """Builds the Stats of a sequence of values at once, exactly as if each
+        value had been passed to update in order. sums optionally gives the
+        sum and the sum of squares of the values, already computed with the
+        same rounding."""
+        stats = Stats()
+        stats.sum, stats.sum2 = sums if sums is not None else (sum(values), sum(map(mul, values, values)))
+        stats.min = min(chain((stats.min,), values))
+        stats.max = max(chain((stats.max,), values))
+        stats.count = len(values)
+        elems = set(values)
+        stats.elems = elems if len(elems) <= Stats.MAX_CARDINALITY else None
+        return stats
+
     @property
     def avg(self):
         return self.sum / self.count
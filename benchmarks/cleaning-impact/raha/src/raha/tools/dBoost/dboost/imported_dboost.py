@@ -6,7 +6,7 @@ def run(params):
         from os import sys, path
         sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
 
-    from . import features, cli, outliers
+    from . import features, cli, outliers_batch
     from .utils.read import stream_tuples
     from .utils.printing import print_rows, debug
 
@@ -24,15 +24,38 @@ def run(params):
     if not args.inmemory and not args.trainwith.seekable():
         parser.error("Input does not support streaming. Try using --in-memory or loading input from a file?")
 
-    # TODO: Input should be fed to all models in one pass.
-    for model in models:
-        for analyzer in analyzers:
-            outlier_cells = list(outliers(trainset_generator, testset_generator, 
-                                          analyzer, model, rules,args.runtime_progress, args.maxrecords))   # outliers is defined in __init__.py
-
+    for analyzer in analyzers:
+        for model, outlier_cells in outliers_batch(trainset_generator, testset_generator,
+                                                   analyzer, models, rules, args.maxrecords):   # outliers_batch is defined in __init__.py
             if len(outlier_cells) == 0:
                 debug("   All clean!")
             else:
                 print_rows(outlier_cells, model, analyzer.hints,
                            features.descriptions(rules), args.verbosity, dataset_name=args.input.name)
                 debug("   {} outliers found".format(len(outlier_cells)))
+
+def run_dataframe(dataframe, model_configurations, analyzer_configuration = ("statistical", "0.5"), floats_only = False):
+    """Runs dBoost in memory on a dataframe, without the CSV round-trip of run.
+
+    The header is parsed as the first tuple, exactly as when run reads the
+    dataframe's CSV file. Each configuration is a list such as
+    ["histogram", "0.1", "0.3"] or ["gaussian", "1.5"]; the analyzer is fitted
+    once and shared by all of them. Returns, for each configuration, the
+    (linum, field_id) pairs run would write to its -dboost_output.csv file."""
+    from . import features, cli, outliers_batch
+    from .utils.read import parse_rows
+    from .utils.printing import outlier_cells
+
+    registered_models = {module.ID: module for module in cli.REGISTERED_MODELS}
+    registered_analyzers = {module.ID: module for module in cli.REGISTERED_ANALYZERS}
+    models = [registered_models[configuration[0]].from_parse(configuration[1:])
+              for configuration in model_configurations]
+    analyzer = registered_analyzers[analyzer_configuration[0]].from_parse(analyzer_configuration[1:])
+    rules = {t: list(rs) for t, rs in features.rules.items()}
+
+    rows = [[str(column) for column in dataframe.columns]] + dataframe.values.tolist()
+    dataset = parse_rows(rows, floats_only)
+    dataset_generator = lambda: dataset
+
+    return [outlier_cells(model_outliers, analyzer.hints)
+            for _, model_outliers in outliers_batch(dataset_generator, dataset_generator, analyzer, models, rules)]
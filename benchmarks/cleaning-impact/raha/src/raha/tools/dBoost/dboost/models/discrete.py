@@ -59,6 +59,11 @@ class Histogram:
             self.fit_one(X)
         self.finish_fit()
 
+    def fit_columns(self, columns, analyzer):
+        self.counters = columns.counters(Histogram.MAX_HIST_SIZE)
+        self.sizes = columns.sizes()
+        self.finish_fit()
+
     def fit_one(self, X):
         # TODO: discard too full counters as we count?
         self.counters = tupleops.defaultif(self.counters, X, collections.Counter)
@@ -25,6 +25,9 @@ class Simple:
             sys.exit(1)
         self.model = analyzer.stats
 
+    def fit_columns(self, columns, analyzer):
+        self.fit(None, analyzer)
+
     def test_one(self, xi, stats):
         return stats == None or abs(xi - stats.avg) <= self.tolerance * stats.sigma
 
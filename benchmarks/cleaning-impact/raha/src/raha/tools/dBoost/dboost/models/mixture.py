@@ -48,6 +48,9 @@ class Mixture:
         # pyplot.hist(ps, bins = 30)
         # pyplot.show()
 
+    def fit_columns(self, columns, analyzer):
+        self.gmms = [self.make_gmm(to_fit) for to_fit in columns[0]]
+
     def test_one(self, xi, gmm_pos):
         from numpy import argmax
         gmm = self.gmms[gmm_pos]
@@ -56,6 +59,33 @@ class Mixture:
         distance = Mixture.mahalanobis(xi, gmm, component)
         return component, gmm.weights_[component] * (1-erf(distance / sqrt(2)))
 
+    def test_batch(self, correlations, gmm_pos):
+        """Vectorized test_one over an array of correlations. As in test_one,
+        where score_samples only scores the one sample it is given, the best
+        match component is always the first one."""
+        import numpy
+        gmm = self.gmms[gmm_pos]
+        component = 0
+        u = correlations - gmm.means_[component]
+        distances = numpy.sqrt((u * ((1 / gmm.covariances_[component]) * u)).sum(axis = 1))
+        return component, gmm.weights_[component] * (1 - numpy.array([erf(x) for x in (distances / sqrt(2)).tolist()]))
+
+    def find_discrepancies_batch(self, Xs):
+        """Vectorized find_discrepancies over a list of expanded tuples, scoring
+        all of them at once with each GMM."""
+        import numpy
+        discrepancies = [[] for _ in Xs]
+        if len(Xs) == 0:
+            return discrepancies
+
+        for gmm_pos in range(len(self.gmms)):
+            correlations = numpy.array([X[0][gmm_pos] for X in Xs], dtype = float)
+            _, probabilities = self.test_batch(correlations, gmm_pos)
+            for index in numpy.flatnonzero(probabilities < self.cutoff).tolist():
+                discrepancies[index].append(((0, gmm_pos),))
+
+        return discrepancies
+
     def find_discrepancies(self, X, index):
         correlations = X[0]
         discrepancies = []
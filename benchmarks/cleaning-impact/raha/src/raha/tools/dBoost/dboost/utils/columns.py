@@ -0,0 +1,63 @@
+"""Columnar buffer of expanded tuples.
+
+Each expanded tuple X is a tuple of fields, each field being a tuple of
+features. ExpandedColumns stores the same data transposed: one column per
+(field_id, feature_id), so that models can be fitted feature by feature, and
+statistics shared by several models (such as value counts) are computed once.
+"""
+
+from collections import Counter
+from itertools import repeat
+
+class ExpandedColumns:
+    def __init__(self, Xs):
+        Xs = list(Xs)
+        self.nb_rows = len(Xs)
+        self.columns = tuple(tuple(zip(*field)) for field in zip(*Xs)) if Xs else ()
+        self._counters = {}
+        self._sizes = None
+
+    def __len__(self):
+        return self.nb_rows
+
+    def __getitem__(self, field_id):
+        return self.columns[field_id]
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def rows(self):
+        """Yields the expanded tuples back, in their original order."""
+        fields = (zip(*field) if len(field) > 0 else repeat((), self.nb_rows) for field in self.columns)
+        for X in zip(*fields):
+            yield X
+
+    def expand_hints(self, hints):
+        """Prepends the field of correlated feature pairs, as expand_hints does
+        on each tuple, and returns the resulting buffer."""
+        expanded = ExpandedColumns(())
+        hint_columns = tuple(tuple(zip(self.columns[idx][sidx], self.columns[idy][sidy]))
+                             for (idx, sidx), (idy, sidy) in hints)
+        expanded.nb_rows = self.nb_rows
+        expanded.columns = (hint_columns,) + self.columns
+        return expanded
+
+    def counters(self, max_size):
+        """Counts the values of each column, discarding (None) the counters of
+        columns with more than max_size distinct values."""
+        if max_size not in self._counters:
+            self._counters[max_size] = tuple(tuple(ExpandedColumns.counter(column, max_size) for column in field)
+                                             for field in self.columns)
+        return self._counters[max_size]
+
+    def sizes(self):
+        """Counts the non-null values of each column."""
+        if self._sizes is None:
+            self._sizes = tuple(tuple(sum(1 for xi in column if xi != None) for column in field)
+                                for field in self.columns)
+        return self._sizes
+
+    @staticmethod
+    def counter(column, max_size):
+        counter = Counter(column)
+        return counter if len(counter) <= max_size else None
@@ -54,20 +54,19 @@ def print_rows(outliers, model, hints, rules_descriptions, verbosity = 0, max_w
 
     results_file = open(dataset_name + "-dboost_output.csv", "w")
     csv_writer = csv.writer(results_file, delimiter=",", quotechar='"', quoting=csv.QUOTE_MINIMAL)
+    for linum, column in outlier_cells(outliers, hints):
+        csv_writer.writerow([linum, column])
+
+def outlier_cells(outliers, hints):
+    """Returns the (linum, field_id) pairs of the fields involved in the
+    discrepancies of each outlier, in the order print_rows writes them."""
+    cells = []
     for linum, (x, X, discrepancies) in outliers:
-        highlight = [field_id for fields_group in discrepancies
-                              for field_id, _ in expand_hints(fields_group, hints)]
-        column_value_dictionary = {}
-        for fields_group in discrepancies:
-            expanded = expand_hints(fields_group, hints)
-            field_ids, values, features = zip(*((field_id, x[field_id],
-                                                 rules_descriptions[type(x[field_id])][feature_id])
-                                                for field_id, feature_id in expanded))
-            for i in range(len(field_ids)):
-                column_value_dictionary[field_ids[i]] = values[i]
-        for column in column_value_dictionary:
-            csv_writer.writerow([linum, column])
-            # column_value_dictionary[column] is the detected value
+        # Each field is reported once, in order of first appearance.
+        field_ids = dict.fromkeys(field_id for fields_group in discrepancies
+                                  for field_id, _ in expand_hints(fields_group, hints))
+        cells.extend((linum, field_id) for field_id in field_ids)
+    return cells
 
 def colorize(row, indices):
     row = [str(f) for f in row]
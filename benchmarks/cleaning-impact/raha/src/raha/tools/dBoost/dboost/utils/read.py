@@ -1,36 +1,47 @@
 from .autoconv import autoconv
 from .printing import debug
 import sys, csv
+from types import SimpleNamespace
 
 def parse_line_blind(row, floats_only):
     return tuple(autoconv(field, floats_only) for field in row)
 
+def parse_tuples(rows, floats_only, maxrecords, state):
+    """Parses an iterable of string rows, typing every field after the first
+    row, and yields the parsed tuples. Rows of another length or with fields
+    of other types than the first row are discarded. The row length and the
+    types are kept on state (any object with row_length and types attributes,
+    initially None), so that later passes over the same data reuse them."""
+    for rid, row in enumerate(rows):
+        if rid > maxrecords:
+            break
+
+        if state.row_length == None:
+            state.row_length = len(row)
+        elif len(row) != state.row_length:
+            sys.stderr.write("Discarding {} (invalid length)\n".format(row))
+            continue
+
+        if state.types == None:
+            row = parse_line_blind(row, floats_only)
+            state.types = tuple(map(type, row))
+        else:
+            try:
+                row = tuple(conv(field) for conv, field in zip(state.types, row))
+            except ValueError:
+                sys.stderr.write("Discarding {} (invalid types)\n".format(row))
+                continue
+
+        yield row
+
 def stream_tuples(input, fs, floats_only, preload, maxrecords = float("+inf")):
     def stream():
         if stream.call_count > 0:
             input.seek(0)
         stream.call_count += 1
 
-        for rid, row in enumerate(csv.reader(input, delimiter = fs)):
-            if rid > maxrecords:
-                break
-
-            if stream.row_length == None:
-                stream.row_length = len(row)
-            elif len(row) != stream.row_length:
-                sys.stderr.write("Discarding {} (invalid length)\n".format(row))
-                continue
-
-            if stream.types == None:
-                row = parse_line_blind(row, floats_only)
-                stream.types = tuple(map(type, row))
-            else:
-                try:
-                    row = tuple(conv(field) for conv, field in zip(stream.types, row))
-                except ValueError:
-                    sys.stderr.write("Discarding {} (invalid types)\n".format(row))
-                    continue
-
+        tuples = parse_tuples(csv.reader(input, delimiter = fs), floats_only, maxrecords, stream)
+        for rid, row in enumerate(tuples):
             if stream.call_count == 1 and rid == 0 and stream.row_length == 1:
                 debug("Your dataset seems to have only one column. Did you need -F?")
 
@@ -45,3 +56,9 @@ def stream_tuples(input, fs, floats_only, preload, maxrecords = float("+inf")):
         return (lambda: dataset)
     else:
         return stream
+
+def parse_rows(rows, floats_only, maxrecords = float("+inf")):
+    """Parses an iterable of string rows the same way stream_tuples parses a CSV
+    file, and returns the parsed tuples."""
+    state = SimpleNamespace(row_length = None, types = None)
+    return list(parse_tuples(rows, floats_only, maxrecords, state))
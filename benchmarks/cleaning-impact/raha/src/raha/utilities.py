@@ -91,9 +91,7 @@ def evaluation_profiler(dataset_dictionary):
         os.mkdir(ep_folder_path)
     sp_folder_path = os.path.join(d.results_folder, "strategy-profiling")
     columns_performance = {j: {} for j in range(d.dataframe.shape[1])}
-    strategies_file_list = os.listdir(sp_folder_path)
-    for strategy_file in strategies_file_list:
-        strategy_profile = pickle.load(open(os.path.join(sp_folder_path, strategy_file), "rb"))
+    for strategy_profile in raha.StrategyProfileStore(sp_folder_path):
         strategy_name = strategy_profile["name"]
         strategy_output = strategy_profile["output"]
         for column_index, attribute in enumerate(d.dataframe.columns.tolist()):
@@ -199,8 +197,7 @@ def get_selected_strategies_via_historical_data(dataset_dictionary, historical_d
     strategies_output = {}
     strategies_runtime = {}
     selected_strategy_profiles = []
-    for strategy_file in os.listdir(sp_folder_path):
-        strategy_profile = pickle.load(open(os.path.join(sp_folder_path, strategy_file), "rb"))
+    for strategy_profile in raha.StrategyProfileStore(sp_folder_path):
         strategies_output[strategy_profile["name"]] = strategy_profile["output"]
         strategies_runtime[strategy_profile["name"]] = strategy_profile["runtime"]
     for a in d.dataframe.columns.tolist():
@@ -265,8 +262,7 @@ def get_selected_strategies_via_ground_truth(dataset_dictionary, strategies_coun
     worst_strategy_profiles = []
     random_strategy_profiles = []
     best_strategy_profiles = []
-    for strategy_file in os.listdir(sp_folder_path):
-        strategy_profile = pickle.load(open(os.path.join(sp_folder_path, strategy_file), "rb"))
+    for strategy_profile in raha.StrategyProfileStore(sp_folder_path):
         for a in d.dataframe.columns.tolist():
             snd = json.loads(strategy_profile["name"])
             runtime = 0.0
@@ -302,8 +298,7 @@ def get_strategies_count_and_runtime(dataset_dictionary):
     sp_folder_path = os.path.join(d.results_folder, "strategy-profiling")
     strategies_count = 0
     strategies_runtime = 0
-    for strategy_file in os.listdir(sp_folder_path):
-        strategy_profile = pickle.load(open(os.path.join(sp_folder_path, strategy_file), "rb"))
+    for strategy_profile in raha.StrategyProfileStore(sp_folder_path):
         strategies_runtime += strategy_profile["runtime"]
         sn = json.loads(strategy_profile["name"])
         if sn[0] in ["OD", "KBVD"]:
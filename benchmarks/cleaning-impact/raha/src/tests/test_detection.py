@@ -0,0 +1,44 @@
+import types
+
+import numpy
+import scipy.sparse
+import scipy.cluster
+
+from raha.detection import Detection
+
+
+def baseline_clusters(feature_vectors, ks):
+    """
+    The clusters of one column as the dense, dictionary-based build_clusters made them: cluster -> sorted rows.
+    """
+    clusters_k_c = {k: {} for k in ks}
+    try:
+        clustering_model = scipy.cluster.hierarchy.linkage(feature_vectors, method="average", metric="cosine")
+        for k in ks:
+            for index, c in enumerate(scipy.cluster.hierarchy.fcluster(clustering_model, k, criterion="maxclust") - 1):
+                clusters_k_c[k].setdefault(int(c), []).append(index)
+    except ValueError:
+        pass
+    return clusters_k_c
+
+
+def test_build_clusters_matches_baseline_with_duplicate_rows():
+    random_state = numpy.random.RandomState(0)
+    columns_features = []
+    for _ in range(20):
+        distinct_rows = random_state.randint(0, 2, size=(8, 6)).astype(float)
+        distinct_rows[:, 0] = 1.0
+        columns_features.append(distinct_rows[random_state.randint(0, 8, size=40)])
+    # A column with an all-zero row cannot be clustered with cosine distances.
+    columns_features.append(numpy.vstack([columns_features[0][:-1], numpy.zeros((1, 6))]))
+    d = types.SimpleNamespace(dataframe=numpy.empty((40, len(columns_features))),
+                              column_features=[scipy.sparse.csr_matrix(x) for x in columns_features])
+    app = Detection()
+    app.build_clusters(d)
+    ks = list(range(2, app.LABELING_BUDGET + 2))
+    for j, feature_vectors in enumerate(columns_features):
+        expected_clusters = baseline_clusters(feature_vectors, ks)
+        for k in ks:
+            clustering = d.clusterings_k_j[k][j]
+            assert {c: clustering.rows(c).tolist() for c in range(len(clustering))} == expected_clusters[k]
+    assert len(d.clusterings_k_j[2][len(columns_features) - 1]) == 0
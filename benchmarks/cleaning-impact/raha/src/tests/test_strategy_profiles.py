@@ -0,0 +1,52 @@
+import os
+import json
+import tempfile
+
+from raha.strategy_profiles import StrategyProfileStore, StrategyOutputCache
+
+
+def test_append_after_interrupted_index_line():
+    with tempfile.TemporaryDirectory() as folder_path:
+        store = StrategyProfileStore(folder_path)
+        store.append([{"name": "first", "output": [(0, 1), (2, 0)], "runtime": 0.5}])
+        # An append interrupted while writing the index leaves a partial last line.
+        with open(store.index_path, "a") as index_file:
+            index_file.write(json.dumps({"name": "lost", "runtime": 0.1, "offset": 2, "count": 1})[:20])
+        store.append([{"name": "second", "output": [(1, 1)], "runtime": 1.5},
+                      {"name": "third", "output": [], "runtime": 2.5}])
+        assert store.load() == [{"name": "first", "output": [(0, 1), (2, 0)], "runtime": 0.5},
+                                {"name": "second", "output": [(1, 1)], "runtime": 1.5},
+                                {"name": "third", "output": [], "runtime": 2.5}]
+        with open(store.index_path) as index_file:
+            assert all(line.endswith("\n") for line in index_file)
+        assert os.path.getsize(store.cells_path) == 3 * 2 * 4
+
+
+def test_append_after_torn_cells_write():
+    with tempfile.TemporaryDirectory() as folder_path:
+        store = StrategyProfileStore(folder_path)
+        store.append([{"name": "first", "output": [(0, 1), (2, 0)], "runtime": 0.5}])
+        # An append interrupted while writing the cells leaves stray bytes and no index line pointing to them.
+        with open(store.cells_path, "ab") as cells_file:
+            cells_file.write(b"\x01\x00\x00\x00\x02\x00")
+        assert store.load() == [{"name": "first", "output": [(0, 1), (2, 0)], "runtime": 0.5}]
+        store.append([{"name": "second", "output": [(1, 1)], "runtime": 1.5}])
+        assert store.load() == [{"name": "first", "output": [(0, 1), (2, 0)], "runtime": 0.5},
+                                {"name": "second", "output": [(1, 1)], "runtime": 1.5}]
+        assert os.path.getsize(store.cells_path) == 3 * StrategyProfileStore.CELL_SIZE
+
+
+def test_output_cache_after_interrupted_put():
+    with tempfile.TemporaryDirectory() as folder_path:
+        StrategyOutputCache(folder_path).put([("first", {"output": [(0, 1)], "runtime": 0.5})])
+        # A run killed while putting outputs leaves both a torn cells write and a partial index line.
+        store = StrategyProfileStore(folder_path)
+        with open(store.cells_path, "ab") as cells_file:
+            cells_file.write(b"\x07\x00\x00")
+        with open(store.index_path, "a") as index_file:
+            index_file.write('{"name": "lost", "runtime"')
+        StrategyOutputCache(folder_path).put([("second", {"output": [(3, 2), (4, 0)], "runtime": 1.5})])
+        strategy_cache = StrategyOutputCache(folder_path)
+        assert strategy_cache.get("first") == {"output": [(0, 1)], "runtime": 0.5}
+        assert strategy_cache.get("second") == {"output": [(3, 2), (4, 0)], "runtime": 1.5}
+        assert strategy_cache.get("lost") is None